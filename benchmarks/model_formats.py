@@ -0,0 +1,95 @@
+"""
+Size vs. load latency of the model artifact formats.
+
+Fits each ensemble in FORMAT_BENCHMARK_MODELS on a synthetic history, then
+saves it as a legacy joblib dump and as an ml.artifacts file with each
+compression, timing the save, the load (best of `repeat`, so from the page
+cache) and the share of it spent verifying the checksum.
+"""
+import os
+import sys
+import time
+import shutil
+import hashlib
+import tempfile
+
+import joblib
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PACKAGE_ROOT not in sys.path:
+    sys.path.insert(0, PACKAGE_ROOT)
+
+from benchmarks.synthetic_data import generate_sales_data
+from ml.artifacts import COMPRESSION_METHODS, dump_artifact, load_artifact, lz4_available
+from ml.data_louder import engineer_date_features
+from ml.estimators import make_estimator
+
+FORMAT_BENCHMARK_MODELS = {
+    'Gradient Boosting': {'n_estimators': 300},
+    'Hist Gradient Boosting': {'n_estimators': 300},
+    'Random Forest': {'n_estimators': 100, 'min_samples_leaf': 5},
+}
+FORMAT_BENCHMARK_ROWS = 50_000
+# 'joblib' is the legacy format; the rest are ml.artifacts compressions
+FORMATS = ['joblib', 'none', 'zlib:1', 'zlib:6', 'lz4']
+FEATURES = ['Year', 'Month', 'Quarter', 'DayOfYear', 'WeekOfYear', 'MarketingSpend', 'IsHoliday']
+
+
+def _fit(algorithm, params, n_rows):
+    df = engineer_date_features(generate_sales_data(n_rows, n_series=10))
+    model = make_estimator(algorithm, params, n_jobs=-1)
+    return model.fit(df[FEATURES], df['Sales'])
+
+
+def _time_format(model, fmt, directory, repeat):
+    path = os.path.join(directory, f"model.{fmt.replace(':', '_')}")
+    start = time.perf_counter()
+    if fmt == 'joblib':
+        joblib.dump(model, path)
+        sha256 = None
+    else:
+        sha256 = dump_artifact(model, path, fmt)["sha256"]
+    save_time = time.perf_counter() - start
+
+    load_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if fmt == 'joblib':
+            joblib.load(path)
+        else:
+            load_artifact(path, sha256)
+        load_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        hashlib.sha256(f.read()).hexdigest()
+    return {
+        "size_mb": os.path.getsize(path) / 1e6,
+        "save_time": save_time,
+        "load_time": min(load_times),
+        "verify_time": time.perf_counter() - start,
+    }
+
+
+def run_format_benchmark(models=FORMAT_BENCHMARK_MODELS, formats=FORMATS, n_rows=FORMAT_BENCHMARK_ROWS,
+                         repeat=3, on_result=None):
+    """Returns {algorithm: {format: metrics}}; lz4 is skipped when not installed."""
+    formats = [fmt for fmt in formats if lz4_available() or not fmt.startswith('lz4')]
+    unknown = [fmt for fmt in formats if fmt != 'joblib' and fmt.partition(':')[0] not in COMPRESSION_METHODS]
+    if unknown:
+        raise ValueError(f"Unknown formats: {unknown}")
+
+    directory = tempfile.mkdtemp(prefix='sales_formats_')
+    try:
+        results = {}
+        for algorithm, params in models.items():
+            model = _fit(algorithm, params, n_rows)
+            results[algorithm] = {}
+            for fmt in formats:
+                metrics = _time_format(model, fmt, directory, repeat)
+                results[algorithm][fmt] = metrics
+                if on_result:
+                    on_result(algorithm, fmt, metrics)
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,233 @@
+"""
+Benchmarks for the data, training, prediction and reporting paths.
+
+Each scale gets a synthetic dataset in its own temporary working directory
+(the app resolves data/, models/ and reports/ relative to the cwd), and every
+stage runs in a fresh spawned process so caches start cold and the peak RSS
+reported is that stage's own.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# The stages chdir away from the source tree, so make sure it stays importable
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PACKAGE_ROOT not in sys.path:
+    sys.path.insert(0, PACKAGE_ROOT)
+
+from benchmarks.synthetic_data import write_sales_csv
+
+BENCHMARK_SCALES = {
+    'small': {'n_rows': 5_000, 'n_series': 1},
+    'medium': {'n_rows': 50_000, 'n_series': 10},
+    'large': {'n_rows': 500_000, 'n_series': 100},
+}
+DEFAULT_SCALES = ['small', 'medium']
+
+# In dependency order: train needs the data, predict and report the model
+STAGES = ['load_csv', 'load_cached', 'train', 'predict', 'report']
+# Stages that need a trained model run an untimed training first if 'train'
+# isn't being benchmarked itself
+REQUIRES_MODEL = {'predict', 'report'}
+
+TRAIN_ALGORITHM = 'Hist Gradient Boosting'
+TRAIN_HYPERPARAMETERS = {'n_estimators': 100}
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# A stage regresses when it is this much slower (or bigger) than the baseline,
+# ignoring wall-time differences below the timer noise floor
+REGRESSION_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.05
+# Metrics compared against the baseline when both runs recorded them
+COMPARED_METRICS = ("wall_time", "peak_rss_mb", "pdf_size_kb")
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process, in MB."""
+    # On Linux ru_maxrss survives exec, so a freshly spawned process would
+    # report its parent's size; VmHWM is reset and measures this process only.
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _stage_load_csv():
+    from ml.data_louder import DEFAULT_DATA_PATH, load_and_preprocess_data, sidecar_dir
+    # Drop the sidecar from any previous repeat so the CSV is parsed again
+    shutil.rmtree(sidecar_dir(DEFAULT_DATA_PATH), ignore_errors=True)
+    load_and_preprocess_data()
+
+
+def _stage_load_cached():
+    from ml.data_louder import load_and_preprocess_data
+    load_and_preprocess_data()
+
+
+def _stage_train():
+    from ml.model_handler import train_model
+    results = train_model([], TRAIN_ALGORITHM, dict(TRAIN_HYPERPARAMETERS))
+    if "error" in results:
+        raise RuntimeError(results["error"])
+
+
+def _stage_predict():
+    from ml.predictor import generate_prediction_data
+    data = generate_prediction_data(use_cache=False)
+    if data.get("error"):
+        raise RuntimeError(data["error"])
+
+
+def _stage_report():
+    from core.report_generator import generate_report_pdf
+    output_path = os.path.join('reports', 'benchmark.pdf')
+    generate_report_pdf(output_path, 'Benchmark')
+    return {"pdf_size_kb": os.path.getsize(output_path) / 1024}
+
+
+_STAGE_FUNCTIONS = {
+    'load_csv': _stage_load_csv,
+    'load_cached': _stage_load_cached,
+    'train': _stage_train,
+    'predict': _stage_predict,
+    'report': _stage_report,
+}
+
+
+def _run_stage(workdir, stage):
+    """
+    Process entry point: times one stage inside `workdir`. Stage functions
+    may return extra metrics (e.g. the report's PDF size) to record with it.
+    """
+    os.chdir(workdir)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        extra = _STAGE_FUNCTIONS[stage]()
+        wall_time = time.perf_counter() - start
+    return {
+        "wall_time": wall_time,
+        "peak_rss_mb": _peak_rss_mb(),
+        **(extra or {}),
+    }
+
+
+def _time_stage(workdir, stage, repeat):
+    runs = []
+    for _ in range(repeat):
+        # One process per run, so every run starts with cold in-memory caches
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            runs.append(pool.submit(_run_stage, workdir, stage).result())
+    times = [run["wall_time"] for run in runs]
+    metrics = {
+        "wall_time": min(times),
+        "mean_wall_time": sum(times) / len(times),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "repeat": repeat,
+    }
+    # Stage-specific metrics (sizes) are kept at their largest across runs
+    for key in runs[0].keys() - {"wall_time", "peak_rss_mb"}:
+        metrics[key] = max(run[key] for run in runs)
+    return metrics
+
+
+def run_scale(scale, stages=STAGES, repeat=1, on_stage=None, keep_workdir=False):
+    """
+    Benchmarks `stages` on a synthetic dataset of the given BENCHMARK_SCALES
+    size. Returns {stage: metrics}.
+    """
+    config = BENCHMARK_SCALES[scale]
+    workdir = tempfile.mkdtemp(prefix=f'sales_bench_{scale}_')
+    try:
+        os.makedirs(os.path.join(workdir, 'data'))
+        n_rows = write_sales_csv(os.path.join(workdir, 'data', 'historical_sales.csv'),
+                                 config['n_rows'], config['n_series'])
+
+        if REQUIRES_MODEL.intersection(stages) and 'train' not in stages:
+            _time_stage(workdir, 'train', 1)
+
+        results = {}
+        for stage in stages:
+            metrics = _time_stage(workdir, stage, repeat)
+            metrics["rows"] = n_rows
+            metrics["rows_per_sec"] = n_rows / metrics["wall_time"]
+            results[stage] = metrics
+            if on_stage:
+                on_stage(scale, stage, metrics)
+        return results
+    finally:
+        if not keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, stages=STAGES, repeat=1, on_stage=None):
+    """Runs every scale and returns the full results document."""
+    unknown = [stage for stage in stages if stage not in _STAGE_FUNCTIONS]
+    if unknown:
+        raise ValueError(f"Unknown benchmark stages: {unknown}")
+    # Later stages read what earlier ones leave on disk
+    stages = [stage for stage in STAGES if stage in stages]
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "train_algorithm": TRAIN_ALGORITHM,
+        },
+        "scales": {scale: run_scale(scale, stages, repeat, on_stage) for scale in scales},
+    }
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Returns the stored baseline results, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def compare_to_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Annotates each stage in `results` with its ratio to the baseline and
+    returns the list of regressions (wall time, peak RSS or report PDF size
+    more than `tolerance` above the baseline; wall-time changes under
+    MIN_REGRESSION_SECONDS are ignored). Stages and metrics missing from the
+    baseline are skipped.
+    """
+    regressions = []
+    for scale, stages in results["scales"].items():
+        for stage, metrics in stages.items():
+            base = baseline.get("scales", {}).get(scale, {}).get(stage)
+            if base is None:
+                continue
+            for metric in COMPARED_METRICS:
+                if metric not in metrics or metric not in base:
+                    continue
+                ratio = metrics[metric] / base[metric] if base[metric] else 1.0
+                metrics[f"{metric}_vs_baseline"] = ratio
+                if metric == "wall_time" and metrics[metric] - base[metric] < MIN_REGRESSION_SECONDS:
+                    continue
+                if ratio > 1 + tolerance:
+                    regressions.append({"scale": scale, "stage": stage, "metric": metric,
+                                        "value": metrics[metric], "baseline": base[metric],
+                                        "ratio": ratio})
+    return regressions
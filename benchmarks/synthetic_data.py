@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from ml.future_features import DEFAULT_HOLIDAY_MONTHS
+
+
+def generate_sales_data(n_rows, n_series=1, start='2015-01-01', freq='D', seed=0):
+    """
+    Generates a synthetic sales history in the Date,Sales,MarketingSpend,IsHoliday
+    schema of data/historical_sales.csv.
+
+    The rows are split evenly across `n_series` series that share one date
+    range (n_rows // n_series periods of `freq` from `start`); the series are
+    stacked by date without an id column, as several stores reporting into one
+    file would be. Sales follow a trend, yearly seasonality, a holiday uplift
+    and a marketing-spend response plus noise, so models have signal to fit.
+    """
+    rng = np.random.default_rng(seed)
+    n_periods = max(1, n_rows // n_series)
+    dates = pd.date_range(start, periods=n_periods, freq=freq)
+
+    # 1. Calendar drivers, shared by all series
+    months = dates.month.to_numpy()
+    season = np.sin(2 * np.pi * (dates.dayofyear.to_numpy() / 365.25))
+    is_holiday = np.isin(months, DEFAULT_HOLIDAY_MONTHS).astype(np.int8)
+    trend = np.linspace(0, 1, n_periods)
+
+    # 2. Per-series level and noise, laid out as (n_series, n_periods)
+    level = rng.uniform(20_000, 60_000, size=(n_series, 1))
+    spend = rng.normal(1_000, 150, size=(n_series, n_periods)).clip(min=0)
+    sales = (level * (1 + 0.5 * trend + 0.15 * season + 0.1 * is_holiday)
+             + 8 * spend + rng.normal(0, 2_000, size=(n_series, n_periods)))
+
+    # 3. Stack by date, series within each date
+    return pd.DataFrame({
+        'Date': np.tile(dates.to_numpy(), (n_series, 1)).T.ravel(),
+        'Sales': sales.T.ravel().round(2),
+        'MarketingSpend': spend.T.ravel().round(2),
+        'IsHoliday': np.tile(is_holiday, (n_series, 1)).T.ravel(),
+    })
+
+
+def write_sales_csv(path, n_rows, n_series=1, start='2015-01-01', freq='D', seed=0):
+    """Writes generate_sales_data(...) to `path` and returns the row count."""
+    df = generate_sales_data(n_rows, n_series, start, freq, seed)
+    df.to_csv(path, index=False, date_format='%Y-%m-%d')
+    return len(df)
@@ -0,0 +1,293 @@
+"""
+Headless entry point for batch jobs (cron, servers without a display).
+
+    python cli.py train --algorithm "Hist Gradient Boosting" --n-estimators 300
+    python cli.py forecast --output forecast.csv
+    python cli.py report --name Quarterly_Sales_Forecast
+    python cli.py backtest --folds 12 --mode sliding
+    python cli.py bench --scales small medium --save-baseline
+    python cli.py prune --keep 5
+    python cli.py serve --port 8765
+
+Each subcommand imports only the modules it needs, so nothing from PyQt5 is
+loaded and forecasting never imports scikit-learn's training code or
+reportlab. Status messages from the ml/core modules go to stderr; the
+command's result is printed to stdout as JSON.
+"""
+import sys
+import json
+import argparse
+import contextlib
+
+# Mirrors ml.estimators.ALGORITHMS, which would pull in scikit-learn at parse time
+ALGORITHMS = ['Gradient Boosting', 'Hist Gradient Boosting', 'Random Forest', 'Neural Network']
+
+
+def _emit(payload):
+    print(json.dumps(payload, indent=2, default=str))
+
+
+def cmd_train(args):
+    from ml.model_handler import train_model
+
+    hyperparameters = {
+        "n_estimators": args.n_estimators,
+        "max_training": args.max_training,
+        "incremental": args.incremental,
+        "intervals": None if args.intervals == "none" else args.intervals,
+        "backtest_folds": args.backtest_folds,
+    }
+    if args.chunksize is not None:
+        hyperparameters["chunksize"] = args.chunksize
+    if args.compression:
+        hyperparameters["compression"] = args.compression
+    if args.time_budget is not None:
+        hyperparameters["time_budget"] = args.time_budget
+    if args.search:
+        hyperparameters["search"] = args.search
+        hyperparameters["algorithms"] = args.algorithms or [args.algorithm]
+        hyperparameters["n_iter"] = args.n_iter
+
+    with contextlib.redirect_stdout(sys.stderr):
+        results = train_model(args.features or [], args.algorithm, hyperparameters)
+    _emit(results)
+    return 1 if "error" in results else 0
+
+
+def cmd_forecast(args):
+    if args.series_column:
+        from ml.predictor import generate_batch_predictions
+
+        with contextlib.redirect_stdout(sys.stderr):
+            forecast = generate_batch_predictions(series_column=args.series_column, horizon=args.horizon,
+                                                  freq=args.freq)
+        if forecast is None:
+            _emit({"error": "No trained model or data available."})
+            return 1
+    else:
+        from ml.predictor import generate_prediction_data
+
+        with contextlib.redirect_stdout(sys.stderr):
+            data = generate_prediction_data(horizon=args.horizon, freq=args.freq)
+        if data.get("error"):
+            _emit({"error": data["error"]})
+            return 1
+        import pandas as pd
+        forecast = pd.DataFrame({"Period": data['predicted_x'], "Prediction": data['predicted_y']})
+
+    if args.output:
+        forecast.to_csv(args.output, index=False)
+        _emit({"output": args.output, "rows": len(forecast)})
+    else:
+        _emit(forecast.to_dict(orient='records'))
+    return 0
+
+
+def cmd_report(args):
+    import os
+    import datetime
+
+    if args.names:
+        from core.report_generator import generate_reports_batch
+
+        jobs = [{"output_path": os.path.join(args.output_dir, f"{name}.pdf"), "report_name": name}
+                for name in args.names]
+        with contextlib.redirect_stdout(sys.stderr):
+            results = generate_reports_batch(
+                jobs, max_workers=args.workers,
+                on_job_done=lambda result: print(f"Finished {result['report_name']}", file=sys.stderr)
+            )
+        _emit(results)
+        return 0 if all(result["success"] for result in results) else 1
+
+    from core.report_generator import generate_report_pdf
+    from ml.predictor import generate_prediction_data
+
+    report_name = args.name or f"Quarterly_Sales_Forecast_{datetime.datetime.now():%Y%m%d_%H%M%S}"
+    output_path = os.path.join(args.output_dir, f"{report_name}.pdf")
+    with contextlib.redirect_stdout(sys.stderr):
+        data = generate_prediction_data()
+    if data.get("error"):
+        print(f"Error: {data['error']}", file=sys.stderr)
+        _emit({"error": data["error"]})
+        return 1
+    with contextlib.redirect_stdout(sys.stderr):
+        generate_report_pdf(output_path, report_name, data)
+    _emit({"output": output_path})
+    return 0
+
+
+def cmd_backtest(args):
+    from ml.backtest import run_backtest
+    from ml.feature_store import load_feature_frame
+    from ml.model_registry import get_model_entry
+
+    entry = get_model_entry()
+    algorithm = args.algorithm or (entry or {}).get("algorithm") or "Gradient Boosting"
+    params = (entry or {}).get("hyperparameters") if args.algorithm is None else {}
+    with contextlib.redirect_stdout(sys.stderr):
+        df, _ = load_feature_frame()
+        if df is None:
+            _emit({"error": "Failed to load data."})
+            return 1
+        features = (entry or {}).get("features") or ['Year', 'Month', 'Quarter', 'MarketingSpend', 'IsHoliday']
+        df = df[df[features].notna().all(axis=1)]
+        results = run_backtest(df, features, algorithm, params, n_folds=args.folds, horizon=args.horizon,
+                               mode=args.mode, window=args.window, step=args.step, n_jobs=args.jobs)
+    _emit(results)
+    return 1 if results.get("error") else 0
+
+
+def cmd_prune(args):
+    from ml.model_registry import list_models, prune_models
+
+    with contextlib.redirect_stdout(sys.stderr):
+        removed = prune_models(args.keep)
+    _emit({"removed": removed, "kept": [entry["model_id"] for entry in list_models()]})
+    return 0
+
+
+def cmd_serve(args):
+    from core.forecast_server import run_server
+
+    # The server runs until interrupted; its status lines go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        run_server(args.host, args.port, args.batch_window_ms, args.max_batch)
+    return 0
+
+
+def cmd_bench(args):
+    if args.formats:
+        return cmd_bench_formats(args)
+    from benchmarks.suite import (BASELINE_PATH, compare_to_baseline, load_baseline,
+                                  run_benchmarks, save_results)
+
+    def on_stage(scale, stage, metrics):
+        size = f"  PDF {metrics['pdf_size_kb']:,.0f} KB" if 'pdf_size_kb' in metrics else ""
+        print(f"{scale:>8} {stage:<12} {metrics['wall_time']:8.3f} s  "
+              f"{metrics['peak_rss_mb']:8.1f} MB  {metrics['rows_per_sec']:12,.0f} rows/s{size}", file=sys.stderr)
+
+    results = run_benchmarks(args.scales, args.stages, args.repeat, on_stage=on_stage)
+
+    baseline_path = args.baseline or BASELINE_PATH
+    baseline = load_baseline(baseline_path)
+    regressions = []
+    if baseline is not None and not args.save_baseline:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        results["regressions"] = regressions
+
+    if args.output:
+        save_results(results, args.output)
+    if args.save_baseline:
+        save_results(results, baseline_path)
+        print(f"Baseline saved to {baseline_path}", file=sys.stderr)
+    _emit(results)
+    return 1 if regressions else 0
+
+
+def cmd_bench_formats(args):
+    from benchmarks.model_formats import run_format_benchmark
+
+    def on_result(algorithm, fmt, metrics):
+        print(f"{algorithm:>24} {fmt:<8} {metrics['size_mb']:8.2f} MB  save {metrics['save_time']:7.3f} s  "
+              f"load {metrics['load_time']:7.3f} s  (verify {metrics['verify_time']:.3f} s)", file=sys.stderr)
+
+    results = run_format_benchmark(repeat=args.repeat, on_result=on_result)
+    if args.output:
+        from benchmarks.suite import save_results
+        save_results(results, args.output)
+    _emit(results)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Sales Forecast Platform (headless)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train = subparsers.add_parser("train", help="Train and register a new model")
+    train.add_argument("--algorithm", default="Gradient Boosting", choices=ALGORITHMS)
+    train.add_argument("--n-estimators", type=int, default=100)
+    train.add_argument("--max-training", type=int, default=100,
+                       help="Percent of the n_estimators iteration budget to use")
+    train.add_argument("--time-budget", type=float, help="Wall-clock fitting budget in seconds")
+    train.add_argument("--search", choices=["grid", "random", "halving"])
+    train.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, help="Algorithms to include in a search")
+    train.add_argument("--n-iter", type=int, default=10, help="Candidates for random search")
+    train.add_argument("--incremental", action="store_true",
+                       help="Update the latest model with new rows instead of refitting")
+    train.add_argument("--backtest-folds", type=int, default=0,
+                       help="Rolling origins to backtest the trained configuration on (default: no backtest)")
+    train.add_argument("--features", nargs="+", metavar="GROUP",
+                       help='Feature groups to add lag/rolling features from, e.g. "Historical Sales Data"')
+    train.add_argument("--intervals", choices=["quantile", "bootstrap", "none"], default="quantile",
+                       help="Prediction-interval models to train alongside the main model")
+    train.add_argument("--chunksize", type=int,
+                       help="Stream the data file this many rows at a time, aggregated to months "
+                            "(0 reads it whole; default: stream only very large files)")
+    train.add_argument("--compression", help="Model artifact compression: none, zlib[:level] or lz4[:level]")
+    train.set_defaults(func=cmd_train)
+
+    forecast = subparsers.add_parser("forecast", help="Forecast with the latest model")
+    forecast.add_argument("--output", help="Write the forecast to this CSV file")
+    forecast.add_argument("--series-column",
+                          help="Forecast every series in this column of the history in one batch")
+    forecast.add_argument("--horizon", type=int, default=6, help="Periods ahead")
+    forecast.add_argument("--freq", choices=["MS", "W", "D"], default="MS",
+                          help="Forecast step: month start, week or day")
+    forecast.set_defaults(func=cmd_forecast)
+
+    report = subparsers.add_parser("report", help="Generate a PDF report")
+    report.add_argument("--name", help="Report name (default: timestamped)")
+    report.add_argument("--names", nargs="+",
+                        help="Render several reports in parallel, sharing one forecast")
+    report.add_argument("--workers", type=int, default=4, help="Processes for --names")
+    report.add_argument("--output-dir", default="reports")
+    report.set_defaults(func=cmd_report)
+
+    backtest = subparsers.add_parser("backtest", help="Rolling-origin backtest of the latest model's configuration")
+    backtest.add_argument("--algorithm", choices=ALGORITHMS,
+                          help="Backtest this algorithm (default parameters) instead")
+    backtest.add_argument("--folds", type=int, default=5)
+    backtest.add_argument("--horizon", type=int, default=6)
+    backtest.add_argument("--mode", choices=["expanding", "sliding"], default="expanding")
+    backtest.add_argument("--window", type=int, help="Training periods per fold in sliding mode")
+    backtest.add_argument("--step", type=int, default=1, help="Periods between cutoffs")
+    backtest.add_argument("--jobs", type=int, default=-1, help="Fold processes")
+    backtest.set_defaults(func=cmd_backtest)
+
+    bench = subparsers.add_parser("bench", help="Benchmark loading, training, forecasting and reports")
+    bench.add_argument("--scales", nargs="+", default=["small", "medium"],
+                       choices=["small", "medium", "large"])
+    bench.add_argument("--stages", nargs="+", default=["load_csv", "load_cached", "train", "predict", "report"],
+                       choices=["load_csv", "load_cached", "train", "predict", "report"])
+    bench.add_argument("--repeat", type=int, default=1, help="Runs per stage (best time is kept)")
+    bench.add_argument("--output", help="Also write the results JSON to this file")
+    bench.add_argument("--baseline", help="Baseline JSON to compare against (default: benchmarks/baseline.json)")
+    bench.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    bench.add_argument("--tolerance", type=float, default=0.25,
+                       help="Allowed slowdown/growth vs. the baseline before failing (0.25 = 25%%)")
+    bench.add_argument("--formats", action="store_true",
+                       help="Instead, compare model artifact formats by size and load time")
+    bench.set_defaults(func=cmd_bench)
+
+    prune = subparsers.add_parser("prune", help="Delete all but the newest registered models")
+    prune.add_argument("--keep", type=int, default=10, help="Models to keep")
+    prune.set_defaults(func=cmd_prune)
+
+    serve = subparsers.add_parser("serve", help="Serve forecasts over HTTP on this machine")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765, help="Port to listen on (0 picks a free one)")
+    serve.add_argument("--batch-window-ms", type=float, default=5,
+                       help="How long a request waits for others to share its model.predict call")
+    serve.add_argument("--max-batch", type=int, default=256, help="Most requests per batch")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
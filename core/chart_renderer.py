@@ -0,0 +1,157 @@
+import io
+import threading
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from reportlab.graphics.charts.legends import LineLegend
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.shapes import Drawing, Group, String
+from reportlab.graphics.widgets.markers import makeMarker
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.platypus import Image
+
+from core.downsampling import lttb_downsample
+
+# 'vector' draws the chart with reportlab's own graphics (no rasterisation,
+# smallest PDFs); 'raster' renders a PNG with matplotlib at RASTER_DPI.
+DEFAULT_CHART_MODE = 'vector'
+RASTER_DPI = 150
+
+# Point markers only help when they can be told apart
+MAX_MARKER_POINTS = 60
+# Longer series are reduced with LTTB; more points than this can't be seen at
+# report size and only bloat the PDF
+MAX_CHART_POINTS = 1000
+
+ACTUAL_COLOR = '#1f77b4'
+FORECAST_COLOR = '#ff7f0e'
+BAND_ALPHA = 0.25
+
+_figure_lock = threading.Lock()
+_figure = None
+_canvas = None
+
+
+def _series(data):
+    """Returns [(label, x, y, dashed, color)] for the non-empty chart series."""
+    series = [
+        ("Actual Sales", data['historical_x'], data['historical_y'], False, ACTUAL_COLOR),
+        ("Forecast", data['predicted_x'], data['predicted_y'], True, FORECAST_COLOR),
+    ]
+    return [(label, *lttb_downsample(x, y, MAX_CHART_POINTS), dashed, color)
+            for label, x, y, dashed, color in series if len(x)]
+
+
+def _band(data):
+    """Returns (label, x, lower, upper) for the forecast interval, or None."""
+    lower = data.get('predicted_lower', [])
+    if not len(lower):
+        return None
+    label = f"{data['interval_level']:.0%} Interval" if data.get('interval_level') else "Interval"
+    return (label, np.asarray(data['predicted_x'], dtype=float), np.asarray(lower, dtype=float),
+            np.asarray(data['predicted_upper'], dtype=float))
+
+
+def render_vector_chart(data, width=6*inch, height=3*inch):
+    """Draws the historical vs. forecast chart as a native reportlab Drawing."""
+    drawing = Drawing(width, height)
+    drawing.add(String(width / 2, height - 14, "Historical vs. Forecasted Sales",
+                       textAnchor='middle', fontName='Helvetica-Bold', fontSize=11))
+    series = _series(data)
+    if not series:
+        drawing.add(String(width / 2, height / 2, "No data available", textAnchor='middle'))
+        return drawing
+
+    plot = LinePlot()
+    plot.x, plot.y = 55, 35
+    plot.width, plot.height = width - 75, height - 70
+    plot.joinedLines = 1
+    plot.data = [list(zip(x.tolist(), y.tolist())) for _, x, y, _, _ in series]
+    band = _band(data)
+    if band is not None:
+        # A polygon can't share the plot's axes, so draw the band as its edges
+        _, x, lower, upper = band
+        plot.data += [list(zip(x.tolist(), lower.tolist())), list(zip(x.tolist(), upper.tolist()))]
+        for i in (len(series), len(series) + 1):
+            plot.lines[i].strokeColor = colors.HexColor(FORECAST_COLOR)
+            plot.lines[i].strokeWidth = 0.6
+            plot.lines[i].strokeDashArray = [1, 2]
+    for i, (_, x, _, dashed, color) in enumerate(series):
+        plot.lines[i].strokeColor = colors.HexColor(color)
+        plot.lines[i].strokeWidth = 1.2
+        if dashed:
+            plot.lines[i].strokeDashArray = [4, 2]
+        if len(x) <= MAX_MARKER_POINTS:
+            plot.lines[i].symbol = makeMarker('FilledCircle', size=3,
+                                              fillColor=colors.HexColor(color),
+                                              strokeColor=colors.HexColor(color))
+    plot.xValueAxis.labels.fontSize = 7
+    plot.yValueAxis.labels.fontSize = 7
+    plot.yValueAxis.gridStrokeColor = colors.lightgrey
+    plot.yValueAxis.visibleGrid = 1
+    drawing.add(plot)
+
+    drawing.add(String(plot.x + plot.width / 2, 8, "Time Period", textAnchor='middle', fontSize=8))
+    # Rotated 90 degrees and centred on the y axis
+    drawing.add(Group(String(0, 0, "Revenue (Units)", textAnchor='middle', fontSize=8),
+                      transform=(0, 1, -1, 0, 12, plot.y + plot.height / 2)))
+
+    legend = LineLegend()
+    legend.x, legend.y = plot.x + 10, plot.y + plot.height - 5
+    legend.fontSize = 7
+    legend.colorNamePairs = [(colors.HexColor(color), label) for label, _, _, _, color in series]
+    if band is not None:
+        legend.colorNamePairs.append((colors.HexColor(FORECAST_COLOR).clone(alpha=BAND_ALPHA), band[0]))
+    drawing.add(legend)
+    return drawing
+
+
+def _shared_figure():
+    """Returns the module's Figure/Agg canvas, creating it on first use."""
+    global _figure, _canvas
+    if _figure is None:
+        _figure = Figure(figsize=(7, 3.5))
+        _canvas = FigureCanvasAgg(_figure)
+        _figure.add_subplot(111)
+        _figure.subplots_adjust(left=0.1, right=0.97, top=0.9, bottom=0.14)
+    return _figure, _canvas
+
+
+def render_raster_chart(data, dpi=RASTER_DPI):
+    """
+    Renders the chart to PNG bytes with matplotlib. One Figure and Agg canvas
+    are reused across reports instead of being rebuilt per call.
+    """
+    with _figure_lock:
+        fig, canvas = _shared_figure()
+        ax = fig.axes[0]
+        ax.cla()
+        for label, x, y, dashed, color in _series(data):
+            ax.plot(x, y, color=color, linestyle='--' if dashed else '-', label=label,
+                    marker='o' if len(x) <= MAX_MARKER_POINTS else None, markersize=4)
+        band = _band(data)
+        if band is not None:
+            label, x, lower, upper = band
+            ax.fill_between(x, lower, upper, color=FORECAST_COLOR, alpha=BAND_ALPHA, linewidth=0, label=label)
+        ax.set_title("Historical vs. Forecasted Sales")
+        ax.set_xlabel("Time Period")
+        ax.set_ylabel("Revenue (Units)")
+        if ax.lines:
+            ax.legend()
+        ax.grid(True)
+
+        img_buffer = io.BytesIO()
+        fig.savefig(img_buffer, format='png', dpi=dpi)
+    img_buffer.seek(0)
+    return img_buffer
+
+
+def render_forecast_chart(data, mode=DEFAULT_CHART_MODE, dpi=RASTER_DPI, width=6*inch, height=3*inch):
+    """Returns a flowable with the historical vs. forecast chart for the PDF story."""
+    if mode == 'vector':
+        return render_vector_chart(data, width, height)
+    if mode == 'raster':
+        return Image(render_raster_chart(data, dpi), width=width, height=height)
+    raise ValueError(f"Unknown chart mode: {mode}")
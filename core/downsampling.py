@@ -0,0 +1,70 @@
+import numpy as np
+
+
+def minmax_downsample(x, y, n_bins):
+    """
+    Reduces a line to at most ~2 * n_bins points by keeping the lowest and
+    highest point of each of `n_bins` equal-count bins (plus both ends).
+    With one bin per pixel column the drawn line is indistinguishable from
+    the full one, peaks included. Fully vectorized.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(x)
+    if n_bins < 1 or n <= 2 * n_bins:
+        return x, y
+
+    bin_size = -(-n // n_bins)
+    n_full = n // bin_size * bin_size
+    blocks = y[:n_full].reshape(-1, bin_size)
+    offsets = np.arange(0, n_full, bin_size)
+    indices = [offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1), [0, n - 1]]
+    if n_full < n:
+        tail = y[n_full:]
+        indices.append([n_full + tail.argmin(), n_full + tail.argmax()])
+    keep = np.unique(np.concatenate(indices))
+    return x[keep], y[keep]
+
+
+def lttb_downsample(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: picks `n_out` points that preserve the
+    visual shape of the line. The first and last points are always kept; in
+    between, each bucket keeps the point forming the largest triangle with the
+    previously kept point and the next bucket's average. Better than min/max
+    for static charts where the point budget is well below the pixel width.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Averages of every bucket at once; the last "next bucket" is the end point
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    next_x = np.append(sums_x[1:] / sizes[1:], x[-1])
+    next_y = np.append(sums_y[1:] / sizes[1:], y[-1])
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        px, py = x[previous], y[previous]
+        area = np.abs((px - next_x[i]) * (y[start:end] - py) - (px - x[start:end]) * (next_y[i] - py))
+        previous = start + int(area.argmax())
+        keep[i + 1] = previous
+    return x[keep], y[keep]
+
+
+def visible_slice(x, lower, upper):
+    """
+    Index range of sorted `x` covering [lower, upper], widened by one point
+    each side so lines still run to the edge of the view.
+    """
+    start = max(int(np.searchsorted(x, lower, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(x, upper, side='right')) + 1, len(x))
+    return start, stop
@@ -0,0 +1,454 @@
+"""
+Local HTTP forecast server.
+
+Keeps the latest registered model and the history warm in memory and serves
+forecasts as JSON to other processes on this machine:
+
+    POST /forecast  {"horizon": 6, "series": null, "spend_multiplier": 1.1,
+                     "holiday_override": null, "freq": "MS"}
+    GET  /metrics   request counts, latency percentiles, throughput, batch sizes
+    GET  /health    {"status": "ok", "model_id": ...}
+
+Requests arriving within BATCH_WINDOW_MS of each other (or while the previous
+batch is predicting) are answered from one model.predict call, or one per
+period for recursive models. A newly registered model or an edited dataset is
+picked up at the next batch.
+
+    python cli.py serve --port 8765
+"""
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.instrumentation import span
+from ml.data_louder import dataset_fingerprint, load_and_preprocess_data
+from ml.feature_store import has_derived_features, history_buffers, periods_per_year, recursive_predict
+from ml.future_features import FREQUENCIES, build_future_features
+from ml.intervals import predict_interval
+from ml.model_registry import get_model_entry, load_companion, load_model
+from ml.predictor import DEFAULT_FREQ, DEFAULT_HORIZON, DEFAULT_SPEND_MULTIPLIER, model_features
+from ml.scenarios import build_scenario_matrix
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# How long the first request of a batch waits for others to join it
+BATCH_WINDOW_MS = 5
+MAX_BATCH_SIZE = 256
+MAX_HORIZON = 120
+MAX_BODY_BYTES = 1 << 20
+# Requests whose latency feeds the percentiles, and the throughput window (s)
+LATENCY_SAMPLES = 2000
+THROUGHPUT_WINDOW = 60.0
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class RequestError(Exception):
+    """A request the server can't answer; carries the HTTP status to reply with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_forecast_request(payload):
+    """Validates a /forecast body and returns it with defaults filled in."""
+    if not isinstance(payload, dict):
+        raise RequestError("The request body must be a JSON object.")
+    try:
+        horizon = int(payload.get('horizon', DEFAULT_HORIZON))
+        spend_multiplier = float(payload.get('spend_multiplier', DEFAULT_SPEND_MULTIPLIER))
+    except (TypeError, ValueError):
+        raise RequestError("horizon and spend_multiplier must be numbers.")
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise RequestError(f"horizon must be between 1 and {MAX_HORIZON}.")
+    if spend_multiplier < 0:
+        raise RequestError("spend_multiplier can't be negative.")
+
+    freq = payload.get('freq', DEFAULT_FREQ)
+    if freq not in FREQUENCIES:
+        raise RequestError(f"freq must be one of {list(FREQUENCIES)}.")
+
+    override = payload.get('holiday_override')
+    if isinstance(override, list):
+        if len(override) != horizon or any(flag not in (0, 1) for flag in override):
+            raise RequestError("holiday_override must be 0, 1, or a list of 0/1 flags, one per period.")
+    elif override not in (None, 0, 1):
+        raise RequestError("holiday_override must be 0, 1, or a list of 0/1 flags, one per period.")
+
+    series = payload.get('series')
+    return {"horizon": horizon, "series": None if series is None else str(series),
+            "spend_multiplier": spend_multiplier, "holiday_override": override, "freq": freq}
+
+
+class ServingState:
+    """The warm model, its interval bands and the per-series history it forecasts from."""
+
+    def __init__(self):
+        self.entry = None
+        self.model = None
+        self.bands = None
+        self.features = None
+        self.n_periods_per_year = None
+        self.fingerprint = None
+        self.series = {}       # series id (None = all data) -> {last_date, mean_spend, row}
+        self.buffers = {}      # None or 'series' -> recursive history buffers
+
+    def refresh(self):
+        """Reloads whatever changed since the last batch: the latest model or the data file."""
+        entry = get_model_entry()
+        if entry is None:
+            raise RequestError("No trained model found. Train a model first.", 503)
+        if self.entry is None or entry["model_id"] != self.entry["model_id"]:
+            try:
+                model, entry = load_model(entry["model_id"])
+            except (EOFError, ValueError) as e:
+                raise RequestError(f"Corrupt model file found. Please retrain the model. ({e})", 503)
+            try:
+                self.bands = load_companion(entry, "intervals")
+            except (OSError, EOFError, ValueError) as e:
+                print(f"Could not load prediction intervals for {entry['model_id']}: {e}")
+                self.bands = None
+            self.model, self.entry = model, entry
+            self.features = model_features(model, entry)
+            self.fingerprint = None
+            print(f"Serving model {entry['model_id']}")
+
+        fingerprint = dataset_fingerprint()
+        if fingerprint != self.fingerprint:
+            df_hist = load_and_preprocess_data(chunksize=self.entry.get("chunksize", 0))
+            if df_hist is None:
+                raise RequestError("Could not load historical data.", 503)
+            self._index_history(df_hist)
+            self.fingerprint = fingerprint
+
+    def _index_history(self, df_hist):
+        self.series = {None: {"last_date": df_hist['Date'].max(),
+                              "mean_spend": df_hist['MarketingSpend'].mean(), "row": 0}}
+        if 'Series' in df_hist.columns:
+            stats = df_hist.groupby('Series', sort=True).agg(
+                last_date=('Date', 'max'), mean_spend=('MarketingSpend', 'mean'))
+            # Rows follow history_buffers' sorted key order
+            for row, (series, values) in enumerate(stats.iterrows()):
+                self.series[str(series)] = {"last_date": values['last_date'],
+                                            "mean_spend": values['mean_spend'], "row": row}
+
+        self.buffers = {}
+        if has_derived_features(self.features):
+            self.n_periods_per_year = self.entry.get("periods_per_year") or periods_per_year(df_hist['Date'])
+            self.buffers[None] = history_buffers(df_hist, self.features, self.n_periods_per_year)
+            if 'Series' in df_hist.columns:
+                self.buffers['series'] = history_buffers(df_hist, self.features, self.n_periods_per_year,
+                                                         keys=df_hist['Series'])
+
+    def request_frame(self, request):
+        """Returns (future dates, feature rows) for one request."""
+        stats = self.series.get(request["series"])
+        if stats is None:
+            raise RequestError(f"Unknown series: {request['series']}", 404)
+        base_frame = build_future_features([stats["last_date"]], request["horizon"], request["freq"])
+        X = build_scenario_matrix(base_frame, [request["spend_multiplier"]], [request["holiday_override"]],
+                                  base_spend=stats["mean_spend"], features=self.features)
+        return base_frame['Date'].to_numpy(), X
+
+    def request_buffers(self, request):
+        if request["series"] is None:
+            return self.buffers[None]
+        row = self.series[request["series"]]["row"]
+        return {column: buffer[row:row + 1] for column, buffer in self.buffers['series'].items()}
+
+
+class ForecastServer:
+    """asyncio HTTP server answering forecast requests in micro-batches."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, batch_window_ms=BATCH_WINDOW_MS,
+                 max_batch_size=MAX_BATCH_SIZE):
+        self.host = host
+        self.port = port
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.state = ServingState()
+        # One thread predicts while the event loop collects the next batch
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='forecast-batch')
+        self.queue = None
+        self.server = None
+        self.started_at = None
+        self._metrics_lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._completed = deque()
+        self._counters = {"requests": 0, "errors": 0, "batches": 0, "predict_calls": 0, "rows_predicted": 0}
+        self._batch_sizes = deque(maxlen=LATENCY_SAMPLES)
+
+    # --- Batching ---
+
+    async def start(self):
+        """Binds the socket and starts the batcher. With port=0 the OS picks a free port."""
+        self.queue = asyncio.Queue()
+        self.started_at = time.time()
+        self._batcher = asyncio.ensure_future(self._batch_loop())
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        # Load the model now rather than on the first request
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self.state.refresh)
+        except RequestError as e:
+            print(f"Warning: {e}")
+        print(f"Forecast server listening on http://{self.host}:{self.port}")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self._batcher.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def forecast(self, request):
+        """Queues a parsed request and waits for its batch's answer."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                # Requests that queued up while the last batch was predicting join at once
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            requests = [request for request, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self._predict_batch, requests)
+            except Exception as e:
+                print(f"Error while forecasting a batch: {e}")
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _predict_batch(self, requests):
+        """
+        Runs in the executor thread. Returns one result dict (or exception)
+        per request; all valid requests share the model.predict calls.
+        """
+        with span("serve.batch", size=len(requests)):
+            try:
+                self.state.refresh()
+            except RequestError as e:
+                return [e] * len(requests)
+            state = self.state
+
+            results = [None] * len(requests)
+            frames = {}
+            for i, request in enumerate(requests):
+                try:
+                    frames[i] = state.request_frame(request)
+                except RequestError as e:
+                    results[i] = e
+
+            predictions = {}
+            predict_calls = 0
+            if frames and has_derived_features(state.features):
+                # Recursive models: one recursive pass per horizon, all its requests as paths
+                by_horizon = {}
+                for i in frames:
+                    by_horizon.setdefault(requests[i]["horizon"], []).append(i)
+                for horizon, indices in by_horizon.items():
+                    X = pd.concat([frames[i][1] for i in indices], ignore_index=True)
+                    buffers = {}
+                    for i in indices:
+                        for column, buffer in state.request_buffers(requests[i]).items():
+                            buffers.setdefault(column, []).append(buffer)
+                    buffers = {column: np.vstack(parts) for column, parts in buffers.items()}
+                    values, X = recursive_predict(state.model, state.features, X, buffers,
+                                                  state.n_periods_per_year)
+                    predict_calls += horizon
+                    for n, i in enumerate(indices):
+                        rows = slice(n * horizon, (n + 1) * horizon)
+                        predictions[i] = (values[rows], X.iloc[rows])
+            elif frames:
+                indices = list(frames)
+                X = pd.concat([frames[i][1] for i in indices], ignore_index=True)
+                values = state.model.predict(X)
+                predict_calls += 1
+                offsets = np.cumsum([0] + [len(frames[i][1]) for i in indices])
+                for n, i in enumerate(indices):
+                    rows = slice(offsets[n], offsets[n + 1])
+                    predictions[i] = (values[rows], X.iloc[rows])
+
+            if predictions and state.bands is not None:
+                indices = list(predictions)
+                lower, upper = predict_interval(state.bands, pd.concat([predictions[i][1] for i in indices]),
+                                                np.concatenate([predictions[i][0] for i in indices]))
+                offsets = np.cumsum([0] + [len(predictions[i][0]) for i in indices])
+                bands = {i: (lower[offsets[n]:offsets[n + 1]], upper[offsets[n]:offsets[n + 1]])
+                         for n, i in enumerate(indices)}
+            else:
+                bands = {}
+
+            for i, (values, _) in predictions.items():
+                dates = frames[i][0]
+                result = {
+                    "model_id": state.entry["model_id"],
+                    "series": requests[i]["series"],
+                    "dates": [str(np.datetime_as_string(date, unit='D')) for date in dates],
+                    "predictions": values.tolist(),
+                }
+                if i in bands:
+                    result.update(lower=bands[i][0].tolist(), upper=bands[i][1].tolist(),
+                                  interval_level=state.bands["level"])
+                results[i] = result
+
+        with self._metrics_lock:
+            self._counters["batches"] += 1
+            self._counters["predict_calls"] += predict_calls
+            self._counters["rows_predicted"] += sum(len(values) for values, _ in predictions.values())
+            self._batch_sizes.append(len(requests))
+        return results
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line."}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Invalid Content-Length."}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "Request body too large."}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self._dispatch(method, path.split('?')[0], body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        if path == '/health':
+            entry = self.state.entry
+            return 200, {"status": "ok" if entry else "no model", "model_id": entry and entry["model_id"]}
+        if path == '/metrics':
+            return 200, self.metrics()
+        if path != '/forecast':
+            return 404, {"error": f"No such endpoint: {path}"}
+        if method != 'POST':
+            return 405, {"error": "Use POST for /forecast."}
+
+        start = time.perf_counter()
+        try:
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                raise RequestError("The request body is not valid JSON.")
+            result = await self.forecast(parse_forecast_request(payload))
+            status = 200
+        except RequestError as e:
+            result, status = {"error": str(e)}, e.status
+        except Exception as e:
+            result, status = {"error": f"Forecast failed: {e}"}, 500
+        self._record(status, time.perf_counter() - start)
+        return status, result
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=str).encode()
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    # --- Metrics ---
+
+    def _record(self, status, elapsed):
+        now = time.monotonic()
+        with self._metrics_lock:
+            self._counters["requests"] += 1
+            if status != 200:
+                self._counters["errors"] += 1
+            self._latencies.append(elapsed * 1000)
+            self._completed.append(now)
+            while self._completed and now - self._completed[0] > THROUGHPUT_WINDOW:
+                self._completed.popleft()
+
+    def metrics(self):
+        """Request/batch counters, latency percentiles (ms) and recent throughput."""
+        with self._metrics_lock:
+            latencies = np.array(self._latencies)
+            batch_sizes = np.array(self._batch_sizes)
+            now = time.monotonic()
+            recent = [t for t in self._completed if now - t <= THROUGHPUT_WINDOW]
+            counters = dict(self._counters)
+        uptime = time.time() - self.started_at if self.started_at else 0.0
+        window = min(THROUGHPUT_WINDOW, uptime) or 1.0
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist() if len(latencies) else (None,) * 3
+        return {
+            "model_id": self.state.entry and self.state.entry["model_id"],
+            "uptime_s": uptime,
+            **counters,
+            "latency_ms": {"p50": p50, "p95": p95, "p99": p99,
+                           "mean": float(latencies.mean()) if len(latencies) else None},
+            "throughput_rps": len(recent) / window,
+            "batch_size": {"mean": float(batch_sizes.mean()) if len(batch_sizes) else None,
+                           "max": int(batch_sizes.max()) if len(batch_sizes) else None},
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+        }
+
+
+def run_server(host=DEFAULT_HOST, port=DEFAULT_PORT, batch_window_ms=BATCH_WINDOW_MS,
+               max_batch_size=MAX_BATCH_SIZE):
+    """Serves until interrupted."""
+    server = ForecastServer(host, port, batch_window_ms, max_batch_size)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("Forecast server stopped.")
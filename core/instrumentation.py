@@ -0,0 +1,203 @@
+"""
+Lightweight timing spans and counters for the hot paths.
+
+Instrumentation is off by default and every entry point returns immediately
+when it is, so spans can stay in production code. Set SALES_TRACE=1 to
+collect in-process stats (shown on the Diagnostics tab), or SALES_TRACE to a
+file path to also append every span as a JSON line. Child processes (model
+training, report workers) inherit the variable and append to the same file.
+
+    with span("predict.model_predict", rows=len(X)):
+        model.predict(X)
+
+    @traced("report.build")
+    def build(...): ...
+"""
+import os
+import json
+import time
+import functools
+import threading
+from collections import deque
+
+TRACE_ENV_VAR = 'SALES_TRACE'
+# Most recent spans kept in memory for the diagnostics panel
+RECENT_SPANS = 200
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_log_file = None
+_stats = {}
+_counters = {}
+_recent = deque(maxlen=RECENT_SPANS)
+
+
+class _NullSpan:
+    """Shared no-op span returned while instrumentation is disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A timed block; records its duration, fields and parent span on exit."""
+    __slots__ = ('name', 'fields', 'start', 'parent')
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields):
+        """Attaches extra fields (row counts, cache hits...) to the span."""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        _local.stack.pop()
+        record = {"ts": time.time(), "span": self.name, "ms": round(elapsed_ms, 3),
+                  "parent": self.parent, "pid": os.getpid(),
+                  "thread": threading.current_thread().name}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.fields:
+            record.update(self.fields)
+        _record(self.name, elapsed_ms, record)
+        return False
+
+
+def _record(name, elapsed_ms, record):
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed_ms
+        stats[2] = max(stats[2], elapsed_ms)
+        _recent.append(record)
+        if _log_file is not None:
+            _log_file.write(json.dumps(record, default=str) + '\n')
+
+
+def span(name, **fields):
+    """Returns a context manager timing the enclosed block as `name`."""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, fields)
+
+
+def traced(name=None):
+    """Decorator that times every call of the function as a span."""
+    def decorate(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    """Adds `value` to the counter `name`."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def enable(log_path=None):
+    """
+    Turns instrumentation on. With `log_path`, spans are also appended to
+    that file as JSON lines (line-buffered, so several processes can share it).
+    """
+    global _enabled, _log_file
+    with _lock:
+        if _log_file is not None:
+            _log_file.close()
+            _log_file = None
+        if log_path:
+            directory = os.path.dirname(log_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            _log_file = open(log_path, 'a', buffering=1)
+        _enabled = True
+
+
+def disable():
+    global _enabled, _log_file
+    with _lock:
+        _enabled = False
+        if _log_file is not None:
+            _log_file.close()
+            _log_file = None
+
+
+def is_enabled():
+    return _enabled
+
+
+def snapshot():
+    """
+    Returns the collected stats: {'spans': {name: {count, total_ms, mean_ms,
+    max_ms}}, 'counters': {...}, 'recent': [records, newest last]}.
+    """
+    with _lock:
+        spans = {name: {"count": n, "total_ms": total, "mean_ms": total / n, "max_ms": peak}
+                 for name, (n, total, peak) in _stats.items()}
+        return {"spans": spans, "counters": dict(_counters), "recent": list(_recent)}
+
+
+def merge(other):
+    """Folds a snapshot() taken in another process into this one's stats."""
+    if not _enabled or not other:
+        return
+    with _lock:
+        for name, stats in other.get("spans", {}).items():
+            mine = _stats.setdefault(name, [0, 0.0, 0.0])
+            mine[0] += stats["count"]
+            mine[1] += stats["total_ms"]
+            mine[2] = max(mine[2], stats["max_ms"])
+        for name, value in other.get("counters", {}).items():
+            _counters[name] = _counters.get(name, 0) + value
+        _recent.extend(other.get("recent", []))
+
+
+def reset():
+    """Clears the collected stats (the log file is left alone)."""
+    with _lock:
+        _stats.clear()
+        _counters.clear()
+        _recent.clear()
+
+
+def _enable_from_environment():
+    setting = os.environ.get(TRACE_ENV_VAR, '').strip()
+    if not setting or setting == '0':
+        return
+    enable(None if setting == '1' else setting)
+
+
+_enable_from_environment()
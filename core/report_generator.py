@@ -1,16 +1,27 @@
 import os
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, TableStyle
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
-from reportlab.lib import colors
-import io
 
+from core.chart_renderer import DEFAULT_CHART_MODE, RASTER_DPI, render_forecast_chart
+from core.instrumentation import span, traced
+from core.report_tables import build_data_tables
 from ml.predictor import generate_prediction_data
-from matplotlib.figure import Figure
 
-def generate_report_pdf(output_path, report_name):
+# Report rendering is CPU-bound (matplotlib + reportlab), so fan out to processes
+REPORT_WORKERS = min(4, os.cpu_count() or 1)
+
+@traced("report.generate_report_pdf")
+def generate_report_pdf(output_path, report_name, data=None, chart_mode=DEFAULT_CHART_MODE,
+                        dpi=RASTER_DPI):
     """
     Generates a PDF report with a chart and data table.
+
+    `data` is a generate_prediction_data() result; it is computed here when
+    not supplied, so batch callers can share one forecast across reports.
+    chart_mode is 'vector' (native PDF drawing) or 'raster' (PNG at `dpi`).
     """
     if not os.path.exists(os.path.dirname(output_path)):
         os.makedirs(os.path.dirname(output_path))
@@ -31,26 +42,11 @@ def generate_report_pdf(output_path, report_name):
     story.append(Spacer(1, 0.25*inch))
 
     # 3. Generate Data and Chart
-    data = generate_prediction_data()
-    
-    # Create Matplotlib chart in memory
-    fig = Figure(figsize=(7, 3.5), dpi=300)
-    ax = fig.add_subplot(111)
-    ax.plot(data['historical_x'], data['historical_y'], marker='o', label='Actual Sales')
-    ax.plot(data['predicted_x'], data['predicted_y'], marker='o', linestyle='--', label='Forecast')
-    ax.set_title("Historical vs. Forecasted Sales")
-    ax.set_xlabel("Time Period")
-    ax.set_ylabel("Revenue (Units)")
-    ax.legend()
-    ax.grid(True)
-    
-    # Save the plot to a PNG in a memory buffer
-    img_buffer = io.BytesIO()
-    fig.savefig(img_buffer, format='png', bbox_inches='tight')
-    img_buffer.seek(0)
+    if data is None:
+        data = generate_prediction_data()
     
-    # Add the image to the PDF story
-    chart_image = Image(img_buffer, width=6*inch, height=3*inch)
+    with span("report.chart", mode=chart_mode):
+        chart_image = render_forecast_chart(data, mode=chart_mode, dpi=dpi)
     story.append(chart_image)
     story.append(Spacer(1, 0.25*inch))
 
@@ -58,36 +54,116 @@ def generate_report_pdf(output_path, report_name):
     table_title = Paragraph("Detailed Data", styles['h2'])
     story.append(table_title)
     
-    table_data = [['Time Period', 'Actual Sales', 'Forecasted Sales']]
-    
-    # Combine historical and forecast data for the table
-    all_periods = sorted(list(set(data['historical_x']) | set(data['predicted_x'])))
-    hist_dict = dict(zip(data['historical_x'], data['historical_y']))
-    pred_dict = dict(zip(data['predicted_x'], data['predicted_y']))
-
-    for period in all_periods:
-        actual_value = hist_dict.get(period, '-')
-        forecast_value = pred_dict.get(period, '-')
-        
-        # Conditionally format only if the value is a number
-        actual = f"{actual_value:.2f}" if isinstance(actual_value, (int, float)) else '-'
-        forecast = f"{forecast_value:.2f}" if isinstance(forecast_value, (int, float)) else '-'
-        
-        table_data.append([period, actual, forecast])
-        
-    report_table = Table(table_data)
-    style = TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.grey),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0,0), (-1,0), 12),
-        ('BACKGROUND', (0,1), (-1,-1), colors.beige),
-        ('GRID', (0,0), (-1,-1), 1, colors.black)
-    ])
-    report_table.setStyle(style)
-    story.append(report_table)
+    # Actuals and forecasts are merged with NumPy and emitted as chunked
+    # LongTables so large histories render in linear time
+    with span("report.tables", rows=len(data['historical_x']) + len(data['predicted_x'])):
+        story.extend(build_data_tables(data))
 
     # 5. Build the PDF
-    doc.build(story)
-    print(f"Report successfully generated at: {output_path}")
\ No newline at end of file
+    with span("report.build"):
+        doc.build(story)
+    print(f"Report successfully generated at: {output_path}")
+
+
+def _run_report_job(output_path, report_name, data=None):
+    """Process-pool entry point for a single report."""
+    generate_report_pdf(output_path, report_name, data)
+    return output_path
+
+
+def _new_report_pool(max_workers):
+    # spawn rather than fork: the parent may be running a Qt event loop
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def generate_reports_batch(jobs, max_workers=REPORT_WORKERS, on_job_done=None):
+    """
+    Renders many reports across a process pool.
+
+    Each job is a dict with 'output_path' and 'report_name', plus either
+    'data' (a ready generate_prediction_data() result) or 'forecast_args'
+    (keyword arguments for generate_prediction_data). The forecast is computed
+    once per distinct forecast_args in this process and shared by every job in
+    that group. on_job_done(result) is called as each report completes.
+    Returns the list of per-job result dicts, in completion order.
+    """
+    forecasts = {}
+    prepared = []
+    for job in jobs:
+        data = job.get('data')
+        if data is None:
+            forecast_args = job.get('forecast_args') or {}
+            group = tuple(sorted(forecast_args.items()))
+            if group not in forecasts:
+                forecasts[group] = generate_prediction_data(**forecast_args)
+            data = forecasts[group]
+        prepared.append((job, data))
+
+    results = []
+    with _new_report_pool(max_workers) as pool:
+        futures = {
+            pool.submit(_run_report_job, job['output_path'], job['report_name'], data): job
+            for job, data in prepared
+        }
+        for future in as_completed(futures):
+            job = futures[future]
+            error = future.exception()
+            result = {
+                "output_path": job['output_path'],
+                "report_name": job['report_name'],
+                "success": error is None,
+                "error": None if error is None else str(error),
+            }
+            if error is not None:
+                print(f"Error generating report {job['report_name']}: {error}")
+            if on_job_done:
+                on_job_done(result)
+            results.append(result)
+    return results
+
+
+class ReportQueue:
+    """
+    A non-blocking queue of report jobs backed by a long-lived process pool.
+
+    submit() returns immediately; on_done(output_path, success, error) is
+    called from a pool management thread when the report finishes. Worker
+    processes stay alive between jobs, so their data/model/forecast caches
+    are reused by later reports.
+    """
+
+    def __init__(self, max_workers=REPORT_WORKERS):
+        self.max_workers = max_workers
+        self.pool = None
+
+    def submit(self, output_path, report_name, data=None, on_done=None):
+        if self.pool is None:
+            self.pool = _new_report_pool(self.max_workers)
+        pool = self.pool
+        future = pool.submit(_run_report_job, output_path, report_name, data)
+        if on_done:
+            def callback(done_future):
+                # Cancelled or cut off by shutdown(); nobody is waiting for the result any more
+                if done_future.cancelled() or self.pool is not pool:
+                    return
+                error = done_future.exception()
+                if error is not None:
+                    print(f"Error generating report: {error}")
+                on_done(output_path, error is None, None if error is None else str(error))
+            future.add_done_callback(callback)
+        return future
+
+    def shutdown(self, wait=False):
+        """
+        Stops the pool. With `wait`, blocks until every submitted report is
+        done. Without it, queued jobs are cancelled, this returns at once and
+        on_done is no longer called.
+        """
+        pool = self.pool
+        if pool is None:
+            return
+        if not wait:
+            # Detach first so callbacks of jobs cut off below are ignored
+            self.pool = None
+        pool.shutdown(wait=wait, cancel_futures=not wait)
+        self.pool = None
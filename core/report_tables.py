@@ -0,0 +1,76 @@
+import numpy as np
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.platypus import LongTable, TableStyle
+
+TABLE_HEADER = ['Time Period', 'Actual Sales', 'Forecasted Sales']
+TABLE_COL_WIDTHS = [1.5*inch, 2*inch, 2*inch]
+# Used instead when the forecast comes with a prediction interval
+BAND_TABLE_HEADER = TABLE_HEADER + ['Lower Bound', 'Upper Bound']
+BAND_TABLE_COL_WIDTHS = [1.1*inch, 1.2*inch, 1.2*inch, 1*inch, 1*inch]
+
+# Rows per table chunk. Each chunk is a LongTable that repeats its header when
+# it splits across pages; keeping chunks bounded keeps splitting linear.
+TABLE_CHUNK_ROWS = 500
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.grey),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0,0), (-1,0), 12),
+    ('BACKGROUND', (0,1), (-1,-1), colors.beige),
+    ('GRID', (0,0), (-1,-1), 1, colors.black)
+])
+
+
+def merge_actuals_and_forecasts(data):
+    """
+    Aligns actuals and forecasts on the union of their periods. Returns
+    (periods, actual, forecast) arrays with NaN where a series has no value.
+    """
+    historical_x = np.asarray(data['historical_x'])
+    predicted_x = np.asarray(data['predicted_x'])
+    periods = np.union1d(historical_x, predicted_x)
+
+    actual = _align(periods, historical_x, data['historical_y'])
+    forecast = _align(periods, predicted_x, data['predicted_y'])
+    return periods, actual, forecast
+
+
+def _align(periods, x, values):
+    aligned = np.full(len(periods), np.nan)
+    aligned[np.searchsorted(periods, x)] = np.asarray(values, dtype=float)
+    return aligned
+
+
+def format_values(values, fmt='%.2f', missing='-'):
+    """Formats a float array in one pass, using `missing` for NaNs."""
+    formatted = np.char.mod(fmt, values)
+    return np.where(np.isnan(values), missing, formatted)
+
+
+def build_data_tables(data, chunk_rows=TABLE_CHUNK_ROWS):
+    """
+    Builds the 'Detailed Data' table as a list of LongTable flowables, one
+    per `chunk_rows` periods, each with a repeating header row.
+    """
+    periods, actual, forecast = merge_actuals_and_forecasts(data)
+    if periods.dtype.kind == 'f' and np.all(periods == np.round(periods)):
+        periods = periods.astype(np.int64)
+    columns = [periods.astype(str), format_values(actual), format_values(forecast)]
+    header, col_widths = TABLE_HEADER, TABLE_COL_WIDTHS
+    if len(data.get('predicted_lower', [])):
+        predicted_x = np.asarray(data['predicted_x'])
+        columns += [format_values(_align(periods, predicted_x, data['predicted_lower'])),
+                    format_values(_align(periods, predicted_x, data['predicted_upper']))]
+        header, col_widths = BAND_TABLE_HEADER, BAND_TABLE_COL_WIDTHS
+    rows = np.column_stack(columns).tolist()
+
+    tables = []
+    for start in range(0, max(len(rows), 1), chunk_rows):
+        table = LongTable([header] + rows[start:start + chunk_rows],
+                          colWidths=col_widths, repeatRows=1)
+        table.setStyle(TABLE_STYLE)
+        tables.append(table)
+    return tables
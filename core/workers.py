@@ -1,15 +1,19 @@
 
-import time
 import random
 import os
+import multiprocessing
+from queue import Empty
 from PyQt5.QtCore import QObject, pyqtSignal
-from core.report_generator import generate_report_pdf
+from core.instrumentation import merge, span
 
-from ml.model_handler import train_model 
+from ml.model_handler import train_model_process
+from ml.predictor import generate_prediction_data
+from ml.scenarios import DEFAULT_FAN_MULTIPLIERS, evaluate_scenarios
 
 class ModelTrainingWorker(QObject):
     finished = pyqtSignal(dict)      # Signal to emit when training is done, carrying the results dictionary
     progress = pyqtSignal(int)       # Signal to emit for progress updates, carrying an integer (0-100)
+    candidate_result = pyqtSignal(dict)  # Signal to emit as each hyperparameter search candidate is scored
     
     def __init__(self, selected_features, algorithm_choice, hyperparameters):
         super().__init__()
@@ -17,50 +21,87 @@ class ModelTrainingWorker(QObject):
         self.algorithm_choice = algorithm_choice
         self.hyperparameters = hyperparameters
         self.is_running = True
+        self.process = None
 
     def run(self):
-        """The main work method."""
-        for i in range(1, 6):
-            if not self.is_running:
-                break # Exit if canceled
-            time.sleep(1) # Simulate one part of the training
-            self.progress.emit(i * 15) # Emit progress (15, 30, 45, 60, 75)
+        """
+        The main work method. Training runs in a child process so that
+        cancelling can terminate it mid-fit; progress messages from the
+        fitting loop are relayed to the UI as they arrive.
+        """
+        with span("worker.training", algorithm=self.algorithm_choice):
+            self._run_training()
+
+    def _run_training(self):
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        self.process = context.Process(
+            target=train_model_process,
+            args=(queue, self.selected_features, self.algorithm_choice, self.hyperparameters)
+        )
+        self.process.start()
+
+        results = None
+        while self.is_running and results is None:
+            try:
+                message = queue.get(timeout=0.1)
+            except Empty:
+                if not self.process.is_alive():
+                    # The final message may still be in flight from a clean exit
+                    try:
+                        message = queue.get(timeout=0.5)
+                    except Empty:
+                        results = {"error": "Training process exited unexpectedly."}
+                        break
+                else:
+                    continue
+
+            if message[0] == 'progress':
+                self.report_progress(message[1], message[2])
+            elif message[0] == 'finished':
+                results = message[1]
+                merge(results.pop("instrumentation", None))
 
-        if self.is_running:
-            # Call the actual (now fast) training function
-            results = train_model(
-                self.selected_features, self.algorithm_choice, self.hyperparameters
-            )
-            self.progress.emit(100)
-            self.finished.emit(results)
+        if results is None:
+            # Canceled: kill the fit wherever it is
+            self.process.terminate()
+            self.process.join()
+            results = {"canceled": True}
+        else:
+            self.process.join()
+            if "error" not in results:
+                self.progress.emit(100)
+        queue.close()
+        self.finished.emit(results)
+
+    def report_progress(self, value, result=None):
+        """Forwards progress from train_model to the UI thread."""
+        self.progress.emit(value)
+        if result is not None:
+            self.candidate_result.emit(result)
 
     def stop(self):
-        """Stops the worker."""
+        """Stops the worker; run() terminates the training process on its next poll."""
         self.is_running = False
         
-class ReportGenerationWorker(QObject):
+class DashboardWorker(QObject):
     """
-    A worker that runs the PDF report generation in a separate thread.
+    Computes the Overview tab's forecast data off the UI thread, so model
+    loading, data loading and prediction never block the window.
     """
-    finished = pyqtSignal(str, bool) # Emits the report path and success status
-
-    def __init__(self, output_path, report_name):
-        super().__init__()
-        self.output_path = output_path
-        self.report_name = report_name
+    finished = pyqtSignal(dict) # Emits the generate_prediction_data() result, plus 'scenarios'
 
     def run(self):
         """The main work method."""
         try:
-            # Simulate a bit of a delay for data fetching/processing
-            time.sleep(2)
-            
-            # Call the actual PDF generator
-            generate_report_pdf(self.output_path, self.report_name)
-            
-            # Emit success signal
-            self.finished.emit(self.output_path, True)
+            with span("worker.dashboard"):
+                data = generate_prediction_data()
+                if not data.get("error"):
+                    # The forecast dict is shared with the cache, so extend a copy
+                    with span("worker.scenarios", scenarios=len(DEFAULT_FAN_MULTIPLIERS)):
+                        scenarios = evaluate_scenarios(DEFAULT_FAN_MULTIPLIERS, horizon=len(data['predicted_y']))
+                    data = dict(data, scenarios=scenarios)
         except Exception as e:
-            print(f"Error generating report: {e}")
-            # Emit failure signal
-            self.finished.emit(str(e), False)
\ No newline at end of file
+            print(f"Error computing dashboard data: {e}")
+            data = {"error": f"Could not compute forecast: {e}"}
+        self.finished.emit(data)
@@ -5,6 +5,8 @@ from PyQt5.QtCore import QFile, QTextStream
 from ui.prediction_tab import PredictionTab
 from ui.overview_tab import OverviewTab
 from ui.report_tab import ReportsTab
+from ui.diagnostics_tab import DiagnosticsTab
+from core.instrumentation import is_enabled
 
 class SalesForecastApp(QMainWindow):
     def __init__(self):
@@ -19,19 +21,39 @@ class SalesForecastApp(QMainWindow):
         self.tabs = QTabWidget()
         self.layout.addWidget(self.tabs)
 
-        self.overview_tab = OverviewTab()
-        
-        self.prediction_tab = PredictionTab()
-
-        self.reports_tab = ReportsTab()
-
-        self.tabs.addTab(self.overview_tab, "OVERVIEW")
-        self.tabs.addTab(self.prediction_tab, "PREDICTION")
-        self.tabs.addTab(self.reports_tab, "REPORTS")
+        # Tabs are built on first activation; until then each page is an
+        # empty container, so startup cost doesn't depend on the data/model.
+        self.overview_tab = None
+        self.prediction_tab = None
+        self.reports_tab = None
+        self.diagnostics_tab = None
+        self.tab_factories = [
+            ("overview_tab", OverviewTab, "OVERVIEW"),
+            ("prediction_tab", PredictionTab, "PREDICTION"),
+            ("reports_tab", ReportsTab, "REPORTS"),
+        ]
+        # Only shown when timing spans are being collected (SALES_TRACE)
+        if is_enabled():
+            self.tab_factories.append(("diagnostics_tab", DiagnosticsTab, "DIAGNOSTICS"))
+        for _, _, title in self.tab_factories:
+            container = QWidget()
+            container_layout = QVBoxLayout(container)
+            container_layout.setContentsMargins(0, 0, 0, 0)
+            self.tabs.addTab(container, title)
 
-        self.tabs.setCurrentWidget(self.prediction_tab)
+        self.tabs.currentChanged.connect(self.ensure_tab_built)
+        self.tabs.setCurrentIndex(1)
         self.load_stylesheet("ui/styles.qss")
 
+    def ensure_tab_built(self, index):
+        """Constructs the tab at `index` the first time it is shown."""
+        attribute, factory, _ = self.tab_factories[index]
+        if getattr(self, attribute) is not None:
+            return
+        tab = factory()
+        setattr(self, attribute, tab)
+        self.tabs.widget(index).layout().addWidget(tab)
+
     def load_stylesheet(self, filename):
         style_file = QFile(filename)
         if not style_file.open(QFile.ReadOnly | QFile.Text):
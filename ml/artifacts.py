@@ -0,0 +1,184 @@
+"""
+On-disk format for models and their companion artifacts.
+
+An artifact file is a magic line, a one-line JSON header, and a payload
+(compressed as the header says) holding the object pickled with protocol 5
+followed by its large arrays, each 64-byte aligned. The arrays are pickled
+out-of-band (pickle's buffer_callback), so they are neither framed inside the
+pickle stream nor copied out of it when loading.
+
+Loading memory-maps the file, checks its SHA-256 against the registry before
+anything is unpickled, then unpickles with the arrays as views of the mapping.
+That skips joblib's per-array bookkeeping, which dominates the load time of
+boosted ensembles made of hundreds of small trees, and the copies that
+dominate it for forests of large trees. Arrays an estimator doesn't copy on
+load stay read-only views of the file, as with joblib's mmap_mode='r'.
+
+Version 1 artifacts (the whole object in-band) and files without a magic
+line (legacy joblib dumps) still load.
+"""
+import io
+import os
+import json
+import mmap
+import zlib
+import pickle
+import hashlib
+
+import joblib
+
+ARTIFACT_MAGIC = b'SALES-ARTIFACT 2\n'
+ARTIFACT_MAGIC_V1 = b'SALES-ARTIFACT 1\n'
+ARTIFACT_EXTENSION = '.artifact'
+# Out-of-band buffers start at multiples of this, relative to the file
+# (uncompressed) or the decompressed payload
+BUFFER_ALIGNMENT = 64
+
+# 'lz4' needs the optional lz4 package; it decompresses far faster than zlib
+COMPRESSION_METHODS = ['none', 'zlib', 'lz4']
+DEFAULT_COMPRESSION_LEVELS = {'zlib': 1, 'lz4': 0}
+
+
+def _lz4_frame():
+    try:
+        import lz4.frame
+    except ImportError:
+        return None
+    return lz4.frame
+
+
+def lz4_available():
+    return _lz4_frame() is not None
+
+
+# Compress by default only when it costs next to nothing to load
+DEFAULT_COMPRESSION = 'lz4' if lz4_available() else 'none'
+
+
+def parse_compression(compression):
+    """
+    Normalises a compression setting ('none', 'zlib', 'zlib:6', 'lz4', ...) to
+    (method, level). lz4 falls back to zlib when the package isn't installed.
+    """
+    method, _, level = (compression or 'none').partition(':')
+    if method not in COMPRESSION_METHODS:
+        raise ValueError(f"Unknown compression: {compression} (use one of {', '.join(COMPRESSION_METHODS)})")
+    if level and not level.isdigit():
+        raise ValueError(f"Invalid compression level: {compression}")
+    if method == 'lz4' and _lz4_frame() is None:
+        print("lz4 is not installed; compressing with zlib instead.")
+        method = 'zlib'
+    if method == 'none':
+        return method, 0
+    return method, int(level) if level else DEFAULT_COMPRESSION_LEVELS[method]
+
+
+def _compress(payload, method, level):
+    if method == 'zlib':
+        return zlib.compress(payload, level)
+    if method == 'lz4':
+        return _lz4_frame().compress(payload, compression_level=level)
+    return payload
+
+
+def _decompress(payload, method):
+    if method == 'zlib':
+        return zlib.decompress(payload)
+    if method == 'lz4':
+        frame = _lz4_frame()
+        if frame is None:
+            raise ValueError("Artifact is lz4-compressed but lz4 is not installed.")
+        return frame.decompress(payload)
+    return payload
+
+
+def _padding(offset):
+    return b'\0' * (-offset % BUFFER_ALIGNMENT)
+
+
+def _payload_parts(obj):
+    """Returns (parts, layout): the payload pieces to write and where each buffer lands in it."""
+    buffers = []
+    stream = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    parts = [stream]
+    offset = len(stream)
+    layout = []
+    for buffer in buffers:
+        raw = buffer.raw()
+        parts.append(_padding(offset))
+        offset += len(parts[-1])
+        layout.append([offset, raw.nbytes])
+        parts.append(raw)
+        offset += raw.nbytes
+    return parts, {"pickle_size": len(stream), "buffers": layout}
+
+
+def dump_artifact(obj, path, compression=DEFAULT_COMPRESSION):
+    """
+    Writes `obj` to `path` (atomically, via a temporary file) and returns
+    {'sha256', 'size_bytes', 'compression'} for the registry.
+    """
+    method, level = parse_compression(compression)
+    parts, layout = _payload_parts(obj)
+    if method != 'none':
+        parts = [_compress(b''.join(parts), method, level)]
+
+    header = json.dumps(dict(layout, compression=method, level=level, pickle_protocol=5)).encode()
+    # Pad the header line so an uncompressed payload starts aligned in the file
+    header += b' ' * (-(len(ARTIFACT_MAGIC) + len(header) + 1) % BUFFER_ALIGNMENT) + b'\n'
+
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for part in [ARTIFACT_MAGIC, header] + parts:
+            digest.update(part)
+            f.write(part)
+            size += len(part) if isinstance(part, bytes) else part.nbytes
+    os.replace(tmp_path, path)
+    return {"sha256": digest.hexdigest(), "size_bytes": size,
+            "compression": method if method == 'none' else f"{method}:{level}"}
+
+
+def _map_file(path):
+    """Returns a read-only memory map of `path`, or b'' for an empty file."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        # The mapping stays valid after the file is closed (or deleted)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def load_artifact(path, sha256=None, mmap_mode=None):
+    """
+    Loads an artifact written by dump_artifact, or a legacy joblib file.
+
+    With `sha256`, the file is verified first and a mismatch (a truncated or
+    corrupted file) raises ValueError without unpickling anything. mmap_mode
+    only applies to legacy joblib files.
+    """
+    data = _map_file(path)
+    if sha256 is not None and hashlib.sha256(data).hexdigest() != sha256:
+        raise ValueError(f"Checksum mismatch for {os.path.basename(path)}; the file is corrupt.")
+
+    magic = data[:len(ARTIFACT_MAGIC)]
+    if magic not in (ARTIFACT_MAGIC, ARTIFACT_MAGIC_V1):
+        # Legacy joblib dump
+        if not data:
+            raise EOFError(f"{os.path.basename(path)} is empty.")
+        if mmap_mode is not None:
+            return joblib.load(path, mmap_mode=mmap_mode)
+        return joblib.load(io.BytesIO(data))
+
+    view = memoryview(data)
+    header_end = data.find(b'\n', len(ARTIFACT_MAGIC)) + 1
+    header = json.loads(bytes(view[len(ARTIFACT_MAGIC):header_end]))
+    try:
+        payload = _decompress(view[header_end:], header["compression"])
+        if magic == ARTIFACT_MAGIC_V1:
+            return pickle.loads(payload)
+        payload = memoryview(payload)
+        buffers = [payload[offset:offset + size] for offset, size in header["buffers"]]
+        return pickle.loads(payload[:header["pickle_size"]], buffers=buffers)
+    except (pickle.UnpicklingError, zlib.error) as e:
+        raise ValueError(f"Could not read {os.path.basename(path)}: {e}") from e
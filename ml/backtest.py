@@ -0,0 +1,204 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from ml.data_louder import DEFAULT_DATA_PATH, dataset_fingerprint, replace_dir, sidecar_dir, staging_dir
+from ml.estimators import make_estimator
+from ml.feature_store import has_derived_features, parse_feature, periods_per_year, recursive_evaluate, series_keys
+
+BACKTEST_MODES = ['expanding', 'sliding']
+DEFAULT_BACKTEST_FOLDS = 5
+DEFAULT_BACKTEST_HORIZON = 6
+# Fewest periods a fold may train on
+MIN_TRAIN_PERIODS = 12
+# Bump when the matrix files change so older ones are rewritten
+FEATURE_MATRIX_VERSION = 2
+
+
+def write_feature_matrix(df, features, target, directory, meta=None):
+    """
+    Writes the model inputs as plain .npy files (X as one C-contiguous float64
+    matrix, y, and each row's period index) so fold workers can memory-map
+    them read-only instead of receiving copies. With lag/rolling features the
+    raw source columns and series codes are stored too, for recursive
+    forecasting of each fold. The files are built in a
+    staging directory and swapped in whole, so a matrix other processes have
+    mapped is never rewritten underneath them.
+    """
+    staging = staging_dir(directory)
+    try:
+        # Rows sharing a date (several series) belong to the same period
+        _, periods = np.unique(df['Date'].to_numpy(), return_inverse=True)
+        np.save(os.path.join(staging, 'X.npy'), np.ascontiguousarray(df[features].to_numpy(dtype=float)))
+        np.save(os.path.join(staging, 'y.npy'), df[target].to_numpy(dtype=float))
+        np.save(os.path.join(staging, 'periods.npy'), periods.astype(np.int64))
+        sources = sorted({parse_feature(name)[0] for name in features if parse_feature(name)})
+        if sources:
+            np.save(os.path.join(staging, 'sources.npy'), np.ascontiguousarray(df[sources].to_numpy(dtype=float)))
+            np.save(os.path.join(staging, 'keys.npy'), pd.factorize(series_keys(df))[0].astype(np.int64))
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump(dict(meta or {}, features=list(features), target=target, n_rows=len(df),
+                           n_periods=int(periods.max()) + 1, sources=sources,
+                           periods_per_year=periods_per_year(df['Date'])), f)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    replace_dir(staging, directory)
+
+
+def prepare_feature_matrix(df, features, target='Sales', filepath=DEFAULT_DATA_PATH):
+    """
+    Returns the directory of the memory-mappable feature matrix for `df`,
+    writing it next to the dataset's other sidecars unless a matching one
+    (same dataset version and features) is already there. Each feature set
+    gets its own directory, so concurrent runs with different features don't
+    replace each other's matrix mid-backtest.
+    """
+    key = hashlib.sha1(json.dumps([list(features), target]).encode()).hexdigest()[:12]
+    directory = sidecar_dir(filepath, f'features_{key}')
+    fingerprint = dataset_fingerprint(filepath)
+    meta_path = os.path.join(directory, 'meta.json')
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if (meta.get("version") == FEATURE_MATRIX_VERSION and meta.get("fingerprint") == list(fingerprint or ())
+                and meta.get("features") == list(features)
+                and meta.get("target") == target and meta.get("n_rows") == len(df)):
+            return directory
+    except (OSError, ValueError):
+        pass
+
+    # Stamp the dataset version so later runs can reuse the matrix
+    write_feature_matrix(df, features, target, directory,
+                         meta={"version": FEATURE_MATRIX_VERSION, "fingerprint": list(fingerprint or ())})
+    return directory
+
+
+def rolling_origin_cutoffs(n_periods, n_folds=DEFAULT_BACKTEST_FOLDS, horizon=DEFAULT_BACKTEST_HORIZON,
+                           step=1, min_train=MIN_TRAIN_PERIODS):
+    """
+    Returns the cutoff periods of a rolling-origin evaluation: fold i trains on
+    periods before cutoffs[i] and forecasts the `horizon` periods from it.
+    Cutoffs move back `step` periods at a time from the latest full horizon,
+    and never leave fewer than `min_train` training periods.
+    """
+    last = n_periods - horizon
+    cutoffs = [last - step * i for i in range(n_folds)]
+    return sorted(c for c in cutoffs if c >= min_train)
+
+
+def _predict_fold(model, directory, meta, cutoff, test, X, periods):
+    """
+    Forecasts a fold's test window from its cutoff, recursively for models
+    with lag/rolling features (their test-window values would leak actuals).
+    """
+    features = meta["features"]
+    if not has_derived_features(features):
+        return model.predict(X[test])
+    sources = np.load(os.path.join(directory, 'sources.npy'), mmap_mode='r')
+    keys = np.load(os.path.join(directory, 'keys.npy'), mmap_mode='r')
+    history = periods < cutoff
+    df_history = pd.DataFrame(sources[history], columns=meta["sources"]).assign(Date=periods[history])
+    df_future = pd.DataFrame(X[test], columns=features).assign(Date=periods[test])
+    predictions, _ = recursive_evaluate(model, features, df_history, df_future, meta["periods_per_year"],
+                                        keys[history], keys[test])
+    return predictions
+
+
+def _run_fold(directory, meta, algorithm, params, cutoff, horizon, window):
+    # Workers map the shared matrix read-only; only the index arrays are copied
+    X = np.load(os.path.join(directory, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(directory, 'y.npy'), mmap_mode='r')
+    periods = np.load(os.path.join(directory, 'periods.npy'), mmap_mode='r')
+
+    start = 0 if window is None else max(0, cutoff - window)
+    train = (periods >= start) & (periods < cutoff)
+    test = (periods >= cutoff) & (periods < cutoff + horizon)
+
+    model = make_estimator(algorithm, params)
+    model.fit(X[train], y[train])
+    actual = np.asarray(y[test])
+    error = _predict_fold(model, directory, meta, cutoff, test, X, periods) - actual
+    step_index = np.asarray(periods[test]) - cutoff
+
+    # Per-step sums, so the parent can pool folds exactly
+    nonzero = actual != 0
+    return {
+        "cutoff": int(cutoff),
+        "n_train": int(train.sum()),
+        "count": np.bincount(step_index, minlength=horizon),
+        "sse": np.bincount(step_index, weights=error ** 2, minlength=horizon),
+        "sae": np.bincount(step_index, weights=np.abs(error), minlength=horizon),
+        "sum_actual": np.bincount(step_index, weights=np.abs(actual), minlength=horizon),
+        "sape": np.bincount(step_index[nonzero], weights=np.abs(error[nonzero] / actual[nonzero]),
+                            minlength=horizon),
+        "count_ape": np.bincount(step_index[nonzero], minlength=horizon),
+    }
+
+
+def _metrics(count, sse, sae, sum_actual, sape, count_ape):
+    def ratio(numerator, denominator, scale=1.0):
+        return float(scale * numerator / denominator) if denominator else None
+    return {
+        "rmse": float(np.sqrt(sse / count)) if count else None,
+        "mape": ratio(sape, count_ape, 100),
+        "wape": ratio(sae, sum_actual, 100),
+        "n": int(count),
+    }
+
+
+def run_backtest(df, features, algorithm, params=None, target='Sales', n_folds=DEFAULT_BACKTEST_FOLDS,
+                 horizon=DEFAULT_BACKTEST_HORIZON, mode='expanding', window=None, step=1,
+                 min_train=MIN_TRAIN_PERIODS, n_jobs=-1, filepath=DEFAULT_DATA_PATH):
+    """
+    Rolling-origin backtest of `algorithm`/`params` on `df`.
+
+    'expanding' trains each fold on all periods before its cutoff; 'sliding'
+    on the last `window` periods (default: min_train). Folds run concurrently
+    across a process pool, all reading one memory-mapped feature matrix.
+    Models with lag/rolling features forecast each fold's horizon
+    recursively from its cutoff, as in production. Returns a summary dict with RMSE/MAPE/WAPE per horizon step and overall,
+    or a dict with an 'error' key when the history is too short.
+    """
+    if mode not in BACKTEST_MODES:
+        raise ValueError(f"Unknown backtest mode: {mode}")
+    if mode == 'sliding' and window is None:
+        window = min_train
+    if mode == 'expanding':
+        window = None
+
+    directory = prepare_feature_matrix(df, features, target, filepath)
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    n_periods = meta["n_periods"]
+    cutoffs = rolling_origin_cutoffs(n_periods, n_folds, horizon, step, min_train)
+    if not cutoffs:
+        return {"error": f"Not enough history for a {horizon}-period backtest "
+                         f"({n_periods} periods, {min_train} needed for training)."}
+
+    folds = Parallel(n_jobs=n_jobs)(
+        delayed(_run_fold)(directory, meta, algorithm, params, cutoff, horizon, window) for cutoff in cutoffs
+    )
+
+    sums = {key: np.sum([fold[key] for fold in folds], axis=0)
+            for key in ("count", "sse", "sae", "sum_actual", "sape", "count_ape")}
+    per_horizon = [dict(horizon=h + 1, **_metrics(*(sums[key][h] for key in sums))) for h in range(horizon)]
+    dates = np.unique(df['Date'].to_numpy())
+    return {
+        "mode": mode,
+        "window": window,
+        "horizon": horizon,
+        "algorithm": algorithm,
+        "cutoffs": [str(np.datetime_as_string(dates[c], unit='D')) for c in cutoffs],
+        "per_horizon": per_horizon,
+        "overall": _metrics(*(sums[key].sum() for key in sums)),
+        "folds": [{"cutoff": str(np.datetime_as_string(dates[fold["cutoff"]], unit='D')),
+                   "n_train": fold["n_train"],
+                   **_metrics(*(fold[key].sum() for key in sums))} for fold in folds],
+        "error": None,
+    }
@@ -1,22 +1,305 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 
-def load_and_preprocess_data(filepath='data/historical_sales.csv'):
+from core.instrumentation import count, span
+
+DEFAULT_DATA_PATH = 'data/historical_sales.csv'
+
+# How many distinct dataset versions to keep in memory at once
+CACHE_MAX_ENTRIES = 4
+# Bump whenever the engineered columns change so stale sidecars are ignored
+SIDECAR_VERSION = 1
+# Rows per chunk for streaming ingestion; bounds peak memory, not file size
+DEFAULT_CHUNK_SIZE = 250_000
+# Files larger than this are streamed by default instead of read whole
+STREAMING_THRESHOLD_BYTES = 512 * 1024 * 1024
+
+# Narrow dtypes used when streaming very large files
+COMPACT_DTYPES = {'Sales': 'float32', 'MarketingSpend': 'float32', 'IsHoliday': 'int8'}
+COMPACT_DATE_DTYPES = {'Year': 'int16', 'Month': 'int16', 'Quarter': 'int8',
+                       'DayOfYear': 'int16', 'WeekOfYear': 'int8'}
+
+_lock = threading.Lock()
+_frame_cache = OrderedDict()
+
+
+def dataset_fingerprint(filepath=DEFAULT_DATA_PATH):
+    """
+    Returns a (path, mtime, size) tuple identifying the current version of a
+    data file, or None if the file does not exist.
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return (os.path.abspath(filepath), stat.st_mtime_ns, stat.st_size)
+
+
+def resolve_chunksize(fingerprint, chunksize=None):
+    """
+    Returns the chunk size to stream a file with, or 0 to read it whole.
+    None picks automatically: DEFAULT_CHUNK_SIZE above
+    STREAMING_THRESHOLD_BYTES, else 0.
+    """
+    if chunksize is None:
+        return DEFAULT_CHUNK_SIZE if fingerprint[2] > STREAMING_THRESHOLD_BYTES else 0
+    return chunksize
+
+
+def engineer_date_features(df, compact=False):
+    """Adds the calendar columns derived from 'Date' to a frame, in place."""
+    dates = df['Date'].dt
+    df['Year'] = dates.year
+    df['Month'] = dates.month
+    df['Quarter'] = dates.quarter
+    df['DayOfYear'] = dates.dayofyear
+    df['WeekOfYear'] = dates.isocalendar().week.astype(int)
+    if compact:
+        for column, dtype in COMPACT_DATE_DTYPES.items():
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def iter_preprocessed_chunks(filepath=DEFAULT_DATA_PATH, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Streams a sales CSV in chunks of `chunksize` rows, yielding each chunk with
+    the date features engineered and compact dtypes applied.
+    """
+    reader = pd.read_csv(filepath, parse_dates=['Date'], dtype=COMPACT_DTYPES, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            yield engineer_date_features(chunk, compact=True)
+
+
+def load_monthly_aggregate(filepath=DEFAULT_DATA_PATH, chunksize=DEFAULT_CHUNK_SIZE):
+    """
+    Aggregates an arbitrarily large transactional CSV to the monthly grain the
+    models are trained on, without ever holding more than one chunk in memory.
+
+    Sales and MarketingSpend are summed per month and IsHoliday is set if any
+    row in the month is flagged. Partial sums are kept in float64 so summing
+    millions of float32 rows doesn't lose precision.
+    """
+    partials = []
+    for chunk in iter_preprocessed_chunks(filepath, chunksize):
+        month_start = chunk['Date'].dt.to_period('M').dt.to_timestamp()
+        values = chunk[['Sales', 'MarketingSpend', 'IsHoliday']].astype(
+            {'Sales': 'float64', 'MarketingSpend': 'float64'}
+        )
+        partials.append(values.groupby(month_start.to_numpy()).agg(
+            {'Sales': 'sum', 'MarketingSpend': 'sum', 'IsHoliday': 'max'}
+        ))
+        # Fold partials periodically so the list stays small for huge files
+        if len(partials) >= 64:
+            partials = [_combine_monthly(partials)]
+
+    if not partials:
+        return pd.DataFrame(columns=['Date', 'Sales', 'MarketingSpend', 'IsHoliday'])
+
+    monthly = _combine_monthly(partials).rename_axis('Date').reset_index()
+    monthly['Sales'] = monthly['Sales'].astype('float32')
+    monthly['MarketingSpend'] = monthly['MarketingSpend'].astype('float32')
+    monthly['IsHoliday'] = monthly['IsHoliday'].astype('int8')
+    return engineer_date_features(monthly, compact=True)
+
+
+def _combine_monthly(partials):
+    return pd.concat(partials).groupby(level=0).agg(
+        {'Sales': 'sum', 'MarketingSpend': 'sum', 'IsHoliday': 'max'}
+    )
+
+
+def sidecar_dir(filepath, grain='raw'):
+    """Directory holding the columnar cache for a given CSV file and grain."""
+    head, tail = os.path.split(filepath)
+    name = os.path.splitext(tail)[0]
+    if grain != 'raw':
+        name = f"{name}_{grain}"
+    return os.path.join(head, '.cache', name)
+
+
+def staging_dir(directory):
+    """Creates a private, empty directory next to `directory` to build its replacement in."""
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(directory)}-")
+
+
+def replace_dir(staging, directory):
+    """
+    Moves a finished staging directory into place. Files of the previous
+    version are unlinked, never rewritten, so readers that already mapped
+    them keep a consistent view.
+    """
+    retired = None
+    if os.path.isdir(directory):
+        retired = staging + '-old'
+        try:
+            os.rename(directory, retired)
+        except FileNotFoundError:
+            retired = None
+    try:
+        os.rename(staging, directory)
+    except OSError:
+        # Another writer got there first; its copy is just as current
+        shutil.rmtree(staging, ignore_errors=True)
+    if retired:
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+def write_columns(directory, df, meta):
+    """
+    Persists each column of a frame as a typed .npy file. The columns are
+    written to a staging directory that replaces `directory` only once
+    complete, so concurrent readers see either the old set or the new one.
+    """
+    staging = staging_dir(directory)
+    try:
+        columns = []
+        for i, name in enumerate(df.columns):
+            values = df[name].to_numpy()
+            kind = 'native'
+            if values.dtype.kind == 'O' or not isinstance(values.dtype, np.dtype):
+                if df[name].isna().any():
+                    # Strings with missing values can't round-trip through a
+                    # plain unicode array; skip persisting rather than corrupt it.
+                    shutil.rmtree(staging, ignore_errors=True)
+                    return False
+                values = values.astype(str)
+                kind = 'str'
+            np.save(os.path.join(staging, f"col_{i}.npy"), values, allow_pickle=False)
+            columns.append({"name": name, "kind": kind})
+
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump(dict(meta, columns=columns), f)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    replace_dir(staging, directory)
+    return True
+
+
+def read_columns(directory, mmap_mode=None):
+    """
+    Loads a frame written by write_columns, returning (frame, meta) or
+    (None, None). A read that overlaps a replacement of the directory is
+    treated as a miss rather than mixing columns of two versions.
+    """
+    meta_path = os.path.join(directory, 'meta.json')
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+            data = {}
+            for i, column in enumerate(meta['columns']):
+                values = np.load(os.path.join(directory, f"col_{i}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+                data[column['name']] = values.astype(object) if column['kind'] == 'str' else values
+            # meta.json is held open, so its inode can't be reused meanwhile
+            if os.stat(meta_path).st_ino != os.fstat(f.fileno()).st_ino:
+                return None, None
+    except (OSError, ValueError, KeyError):
+        return None, None
+    return pd.DataFrame(data), meta
+
+
+def _read_sidecar(filepath, fingerprint, grain):
+    df, meta = read_columns(sidecar_dir(filepath, grain))
+    if df is None:
+        return None
+    _, mtime_ns, size = fingerprint
+    if (meta.get('version') != SIDECAR_VERSION or meta.get('mtime_ns') != mtime_ns
+            or meta.get('size') != size):
+        return None
+    return df
+
+
+def _write_sidecar(filepath, fingerprint, grain, df):
+    _, mtime_ns, size = fingerprint
+    meta = {"version": SIDECAR_VERSION, "mtime_ns": mtime_ns, "size": size}
+    try:
+        write_columns(sidecar_dir(filepath, grain), df, meta)
+    except OSError as e:
+        # The cache is an optimisation only; a read-only data dir is fine.
+        print(f"Warning: Could not write data cache for {filepath}: {e}")
+
+
+def _remember(cache_key, df):
+    with _lock:
+        _frame_cache[cache_key] = df
+        _frame_cache.move_to_end(cache_key)
+        while len(_frame_cache) > CACHE_MAX_ENTRIES:
+            _frame_cache.popitem(last=False)
+
+
+def clear_dataset_cache():
+    """Drops all in-memory cached frames (on-disk sidecars are left alone)."""
+    with _lock:
+        _frame_cache.clear()
+
+
+def load_and_preprocess_data(filepath=DEFAULT_DATA_PATH, use_cache=True, chunksize=None):
     """
     Loads sales data from a CSV and performs feature engineering.
+
+    Results are cached in memory keyed on the file's path, mtime and size, and
+    persisted as a columnar sidecar next to the CSV so cold starts skip
+    parsing. Editing the CSV invalidates both automatically. The returned
+    frame is shared between callers; take a copy before modifying values.
+
+    Files above STREAMING_THRESHOLD_BYTES (or any file, given a `chunksize`)
+    are streamed instead: the CSV is read `chunksize` rows at a time and
+    aggregated to monthly totals (see load_monthly_aggregate). A chunksize of
+    0 always reads the file whole.
     """
+    fingerprint = dataset_fingerprint(filepath)
+    if fingerprint is None:
+        print(f"Error: Data file not found at {filepath}")
+        return None
+
+    chunksize = resolve_chunksize(fingerprint, chunksize)
+    grain = 'monthly' if chunksize else 'raw'
+    cache_key = fingerprint + (grain,)
+
+    if use_cache:
+        with _lock:
+            df = _frame_cache.get(cache_key)
+            if df is not None:
+                _frame_cache.move_to_end(cache_key)
+        if df is not None:
+            count("data.memory_cache_hit")
+            return df.copy(deep=False)
+
+        with span("data.sidecar_read", grain=grain):
+            df = _read_sidecar(filepath, fingerprint, grain)
+        if df is not None:
+            _remember(cache_key, df)
+            print("Data loaded from cache successfully.")
+            return df.copy(deep=False)
+
     try:
-        df = pd.read_csv(filepath, parse_dates=['Date'])
+        with span("data.csv_parse", grain=grain) as parse_span:
+            if not chunksize:
+                df = pd.read_csv(filepath, parse_dates=['Date'])
+                # Feature Engineering from the date
+                engineer_date_features(df)
+            else:
+                df = load_monthly_aggregate(filepath, chunksize)
+            parse_span.set(rows=len(df))
     except FileNotFoundError:
         print(f"Error: Data file not found at {filepath}")
         return None
 
-    # Feature Engineering from the date
-    df['Year'] = df['Date'].dt.year
-    df['Month'] = df['Date'].dt.month
-    df['Quarter'] = df['Date'].dt.quarter
-    df['DayOfYear'] = df['Date'].dt.dayofyear
-    df['WeekOfYear'] = df['Date'].dt.isocalendar().week.astype(int)
+    if use_cache:
+        with span("data.sidecar_write"):
+            _write_sidecar(filepath, fingerprint, grain, df)
+        _remember(cache_key, df)
+        df = df.copy(deep=False)
 
-    
     print("Data loaded and preprocessed successfully.")
-    return df
\ No newline at end of file
+    return df
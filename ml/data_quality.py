@@ -0,0 +1,252 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.instrumentation import count, span
+from ml.data_louder import DEFAULT_DATA_PATH, dataset_fingerprint, load_and_preprocess_data, sidecar_dir
+from ml.future_features import DEFAULT_HOLIDAY_CALENDAR, holiday_flags
+
+# Bump whenever a check or the scoring changes so stored reports are ignored
+QUALITY_VERSION = 1
+# Reports for this many dataset versions are kept in memory
+QUALITY_CACHE_SIZE = 8
+
+# Weight of each check in the overall score, and the fraction of affected
+# rows at which the check scores zero. Some outliers are normal in sales data,
+# so that check tolerates more than, say, missing values.
+QUALITY_CHECKS = {
+    'date_gaps': {'weight': 2, 'zero_at': 0.10},
+    'duplicate_dates': {'weight': 2, 'zero_at': 0.05},
+    'missing_values': {'weight': 3, 'zero_at': 0.05},
+    'negative_values': {'weight': 2, 'zero_at': 0.05},
+    'outliers': {'weight': 1, 'zero_at': 0.20},
+    'holiday_flags': {'weight': 1, 'zero_at': 0.10},
+}
+VALUE_COLUMNS = ['Sales', 'MarketingSpend']
+
+# Rolling robust z-score: centered window in periods, and the |z| above which
+# a period counts as an outlier (0.6745 scales the MAD to a standard deviation)
+OUTLIER_WINDOW = 13
+OUTLIER_MIN_PERIODS = 5
+OUTLIER_THRESHOLD = 3.5
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+def _date_index(df):
+    """Returns (sorted unique dates, inverse index, rows per date) for df['Date']."""
+    dates = df['Date'].to_numpy(dtype='datetime64[ns]')
+    return np.unique(dates, return_inverse=True, return_counts=True)
+
+
+def check_date_gaps(unique_dates):
+    """Counts periods missing from the date index, stepping by the median spacing."""
+    if len(unique_dates) < 3:
+        return 0, len(unique_dates)
+    steps = np.diff(unique_dates).astype('timedelta64[D]').astype(float)
+    step = np.median(steps)
+    # Monthly steps vary from 28 to 31 days, so round to whole steps
+    missing = int(np.clip(np.rint(steps / step) - 1, 0, None).sum()) if step > 0 else 0
+    return missing, len(unique_dates) + missing
+
+
+def check_duplicate_dates(df, rows_per_date):
+    """
+    Counts rows repeating a date. Files stacking several series share dates, so
+    with a 'Series' column a duplicate is a repeated (series, date) pair, and
+    without one any rows beyond the usual number per date.
+    """
+    if 'Series' in df.columns:
+        return int(df.duplicated(['Series', 'Date']).sum()), len(df)
+    expected = np.median(rows_per_date)
+    return int(np.clip(rows_per_date - expected, 0, None).sum()), len(df)
+
+
+def check_missing_values(df):
+    present = [column for column in VALUE_COLUMNS if column in df.columns]
+    missing = df[present].isna().to_numpy().any(axis=1) if present else np.zeros(len(df), dtype=bool)
+    # A missing column counts against every row
+    if len(present) < len(VALUE_COLUMNS):
+        missing[:] = True
+    return int(missing.sum()), len(df)
+
+
+def check_negative_values(df):
+    present = [column for column in VALUE_COLUMNS if column in df.columns]
+    if not present:
+        return 0, len(df)
+    return int((df[present].to_numpy(dtype=float) < 0).any(axis=1).sum()), len(df)
+
+
+def robust_zscores(values, window=OUTLIER_WINDOW, min_periods=OUTLIER_MIN_PERIODS):
+    """Rolling robust z-scores: deviation from the centered rolling median over the rolling MAD."""
+    values = pd.Series(values, dtype=float)
+    median = values.rolling(window, center=True, min_periods=min_periods).median()
+    deviation = (values - median).abs()
+    mad = deviation.rolling(window, center=True, min_periods=min_periods).median()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = 0.6745 * (values - median) / mad
+    # Flat windows (MAD of 0) and short edges give no score
+    return z.where(mad > 0).to_numpy()
+
+
+def check_outliers(df, inverse, n_dates):
+    """
+    Counts outlying Sales periods. Each series is scored on its own when
+    there is a 'Series' column; otherwise on the total per date.
+    """
+    if 'Sales' not in df.columns or n_dates == 0:
+        return 0, n_dates
+    sales = df['Sales'].to_numpy(dtype=float)
+    if 'Series' in df.columns:
+        ordered = df[['Series', 'Date']].assign(Sales=sales).sort_values(['Series', 'Date'])
+        z = ordered.groupby('Series', sort=False)['Sales'].transform(lambda s: robust_zscores(s.to_numpy()))
+        return int((np.abs(z.to_numpy()) > OUTLIER_THRESHOLD).sum()), len(df)
+    totals = np.bincount(inverse, weights=np.nan_to_num(sales), minlength=n_dates)
+    return int((np.abs(robust_zscores(totals)) > OUTLIER_THRESHOLD).sum()), n_dates
+
+
+def check_holiday_flags(df, unique_dates, inverse, holiday_calendar=None):
+    """
+    Counts rows whose IsHoliday flag is missing or not 0/1, disagrees with
+    other rows of the same date, or disagrees with the holiday calendar the
+    forecasts use for future periods.
+    """
+    if 'IsHoliday' not in df.columns:
+        return len(df), len(df)
+    flags = df['IsHoliday'].to_numpy(dtype=float)
+    invalid = ~np.isin(flags, (0, 1))
+
+    valid_flags = np.where(invalid, 0, flags)
+    n_dates = len(unique_dates)
+    highest = np.zeros(n_dates)
+    lowest = np.ones(n_dates)
+    np.maximum.at(highest, inverse, valid_flags)
+    np.minimum.at(lowest, inverse, valid_flags)
+    conflicting = (highest != lowest)[inverse]
+
+    months = unique_dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    expected = holiday_flags(unique_dates, months, holiday_calendar)[inverse]
+    off_calendar = valid_flags != expected
+    return int((invalid | conflicting | off_calendar).sum()), len(df)
+
+
+def _check_score(name, affected, total):
+    if not total:
+        return 1.0
+    return max(0.0, 1.0 - (affected / total) / QUALITY_CHECKS[name]['zero_at'])
+
+
+def compute_quality_report(df, holiday_calendar=None):
+    """
+    Runs every check on a loaded sales frame and returns
+    {'score': 0-100, 'rows': n, 'checks': {name: {affected, total, fraction, score}}}.
+    The score is the weighted mean of the per-check scores.
+    """
+    if df is None or not len(df):
+        return {"score": 0, "rows": 0, "checks": {}}
+
+    unique_dates, inverse, rows_per_date = _date_index(df)
+    results = {
+        'date_gaps': check_date_gaps(unique_dates),
+        'duplicate_dates': check_duplicate_dates(df, rows_per_date),
+        'missing_values': check_missing_values(df),
+        'negative_values': check_negative_values(df),
+        'outliers': check_outliers(df, inverse, len(unique_dates)),
+        'holiday_flags': check_holiday_flags(df, unique_dates, inverse, holiday_calendar),
+    }
+
+    checks = {}
+    for name, (affected, total) in results.items():
+        checks[name] = {
+            "affected": affected,
+            "total": total,
+            "fraction": affected / total if total else 0.0,
+            "score": _check_score(name, affected, total),
+        }
+    weights = sum(QUALITY_CHECKS[name]['weight'] for name in checks)
+    score = sum(QUALITY_CHECKS[name]['weight'] * check['score'] for name, check in checks.items()) / weights
+    return {"score": int(round(100 * score)), "rows": len(df), "checks": checks}
+
+
+def _calendar_key(holiday_calendar):
+    calendar = DEFAULT_HOLIDAY_CALENDAR if holiday_calendar is None else np.asarray(holiday_calendar)
+    return hashlib.md5(calendar.tobytes()).hexdigest()
+
+
+def _report_path(filepath):
+    return os.path.join(sidecar_dir(filepath, 'quality'), 'report.json')
+
+
+def _read_report(filepath, fingerprint, calendar_key):
+    try:
+        with open(_report_path(filepath)) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (stored.get("version") != QUALITY_VERSION or stored.get("fingerprint") != list(fingerprint)
+            or stored.get("calendar") != calendar_key):
+        return None
+    return stored.get("report")
+
+
+def _write_report(filepath, fingerprint, calendar_key, report):
+    path = _report_path(filepath)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": QUALITY_VERSION, "fingerprint": list(fingerprint),
+                       "calendar": calendar_key, "report": report}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not write data quality report for {filepath}: {e}")
+
+
+def assess_data_quality(filepath=DEFAULT_DATA_PATH, df=None, holiday_calendar=None, use_cache=True):
+    """
+    Returns the quality report (see compute_quality_report) for the current
+    version of a data file, computing it at most once per version: reports
+    are cached in memory and stored next to the dataset's other sidecars,
+    keyed on the file fingerprint. Pass `df` if the frame is already loaded.
+    """
+    fingerprint = dataset_fingerprint(filepath)
+    if fingerprint is None:
+        return compute_quality_report(df, holiday_calendar)
+
+    calendar_key = _calendar_key(holiday_calendar)
+    cache_key = (fingerprint, calendar_key)
+    if use_cache:
+        with _lock:
+            report = _cache.get(cache_key)
+            if report is not None:
+                _cache.move_to_end(cache_key)
+                count("quality.cache_hit")
+                return report
+        report = _read_report(filepath, fingerprint, calendar_key)
+        if report is not None:
+            _remember(cache_key, report)
+            return report
+
+    if df is None:
+        df = load_and_preprocess_data(filepath)
+    with span("quality.compute", rows=0 if df is None else len(df)):
+        report = compute_quality_report(df, holiday_calendar)
+    if use_cache:
+        _write_report(filepath, fingerprint, calendar_key, report)
+        _remember(cache_key, report)
+    return report
+
+
+def _remember(cache_key, report):
+    with _lock:
+        _cache[cache_key] = report
+        _cache.move_to_end(cache_key)
+        while len(_cache) > QUALITY_CACHE_SIZE:
+            _cache.popitem(last=False)
@@ -0,0 +1,147 @@
+import time
+
+import numpy as np
+from sklearn.compose import TransformedTargetRegressor
+from sklearn.ensemble import (GradientBoostingRegressor, HistGradientBoostingRegressor,
+                              RandomForestRegressor)
+from sklearn.neural_network import MLPRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Names match the checkboxes on the Prediction tab
+ALGORITHMS = ['Gradient Boosting', 'Hist Gradient Boosting', 'Random Forest', 'Neural Network']
+
+# Below this many rows a validation split is too small for early stopping to be
+# meaningful (same threshold HistGradientBoostingRegressor uses for 'auto').
+EARLY_STOPPING_MIN_ROWS = 10_000
+
+# Number of progress/budget checkpoints for estimators grown with warm_start
+WARM_START_STEPS = 20
+
+
+def make_estimator(algorithm, params=None, random_state=42, n_jobs=None, early_stopping=False):
+    """
+    Builds an unfitted regressor for one of the supported algorithms.
+
+    `params` are passed to the underlying scikit-learn estimator; for
+    'Hist Gradient Boosting' n_estimators is accepted as an alias of max_iter.
+    n_jobs only applies to Random Forest (histogram boosting uses all cores via
+    OpenMP already).
+    """
+    params = dict(params or {})
+    if algorithm == 'Gradient Boosting':
+        if early_stopping:
+            params.setdefault('validation_fraction', 0.1)
+            params.setdefault('n_iter_no_change', 10)
+        return GradientBoostingRegressor(random_state=random_state, **params)
+    if algorithm == 'Hist Gradient Boosting':
+        if 'n_estimators' in params:
+            params['max_iter'] = params.pop('n_estimators')
+        params.setdefault('early_stopping', early_stopping)
+        return HistGradientBoostingRegressor(random_state=random_state, **params)
+    if algorithm == 'Random Forest':
+        return RandomForestRegressor(random_state=random_state, n_jobs=n_jobs, **params)
+    if algorithm == 'Neural Network':
+        # Networks need scaled inputs, and sales figures are far too large a
+        # target to regress on directly, so scale both sides.
+        if 'hidden_layer_sizes' in params:
+            params['hidden_layer_sizes'] = tuple(params['hidden_layer_sizes'])
+        network = make_pipeline(StandardScaler(), MLPRegressor(random_state=random_state, **params))
+        return TransformedTargetRegressor(regressor=network, transformer=StandardScaler())
+    raise ValueError(f"Unknown algorithm: {algorithm}")
+
+
+def n_fitted_stages(model):
+    """Number of boosting iterations / trees actually fitted."""
+    if isinstance(model, GradientBoostingRegressor):
+        return model.n_estimators_
+    if isinstance(model, HistGradientBoostingRegressor):
+        return model.n_iter_
+    if isinstance(model, RandomForestRegressor):
+        return len(model.estimators_)
+    return None
+
+
+def fit_estimator(model, X, y, time_budget=None, stage_callback=None):
+    """
+    Fits `model`, stopping early once `time_budget` seconds have elapsed.
+
+    stage_callback(done, total) is called as boosting stages / trees are
+    added; returning True from it stops fitting after the current stage.
+    Gradient boosting reports every stage through its fit monitor; histogram
+    boosting and random forests are grown in WARM_START_STEPS increments with
+    warm_start. Other models are fitted in one go.
+    """
+    start = time.perf_counter()
+
+    def should_stop(done, total):
+        stop = bool(stage_callback and stage_callback(done, total))
+        return stop or (time_budget is not None and time.perf_counter() - start > time_budget)
+
+    if isinstance(model, GradientBoostingRegressor):
+        total = model.n_estimators
+        model.fit(X, y, monitor=lambda i, est, local_vars: should_stop(i + 1, total))
+        return model
+
+    if isinstance(model, (HistGradientBoostingRegressor, RandomForestRegressor)):
+        size_param = 'max_iter' if isinstance(model, HistGradientBoostingRegressor) else 'n_estimators'
+        total = getattr(model, size_param)
+        step = max(1, total // WARM_START_STEPS)
+        model.set_params(warm_start=True)
+        for done in range(step, total + step, step):
+            done = min(done, total)
+            model.set_params(**{size_param: done})
+            model.fit(X, y)
+            # Histogram boosting stops short of max_iter when early stopping kicks in
+            if n_fitted_stages(model) < done or should_stop(done, total):
+                break
+        model.set_params(warm_start=False)
+        return model
+
+    model.fit(X, y)
+    if stage_callback:
+        stage_callback(1, 1)
+    return model
+
+
+def supports_incremental(model):
+    """True if update_model can extend this fitted model in place."""
+    return (n_fitted_stages(model) is not None
+            or isinstance(model, TransformedTargetRegressor))
+
+
+def update_model(model, X, y, X_new, y_new, extra_stages=50, epochs=50):
+    """
+    Updates an already fitted model with newly arrived rows instead of
+    refitting from scratch.
+
+    Boosting models and forests get `extra_stages` more stages/trees via
+    warm_start, fitted on X/y (all rows to date) so the new trees correct the
+    residuals on the new data; the existing stages are reused as-is. The
+    neural network runs `epochs` passes of partial_fit over X_new/y_new only.
+    Modifies and returns `model`.
+    """
+    if isinstance(model, TransformedTargetRegressor):
+        scaler, network = model.regressor_[0], model.regressor_[-1]
+        X_scaled = scaler.transform(X_new)
+        y_scaled = model.transformer_.transform(np.asarray(y_new, dtype=float).reshape(-1, 1)).ravel()
+        for _ in range(epochs):
+            network.partial_fit(X_scaled, y_scaled)
+        return model
+
+    if isinstance(model, HistGradientBoostingRegressor):
+        size_param = 'max_iter'
+        # Early stopping would carve a fresh validation split out of the
+        # update data and could stop before any new stage is added.
+        model.set_params(early_stopping=False)
+    elif isinstance(model, (GradientBoostingRegressor, RandomForestRegressor)):
+        size_param = 'n_estimators'
+        if isinstance(model, GradientBoostingRegressor):
+            model.set_params(n_iter_no_change=None)
+    else:
+        raise ValueError(f"Incremental updates are not supported for {type(model).__name__}")
+
+    model.set_params(warm_start=True, **{size_param: n_fitted_stages(model) + extra_stages})
+    model.fit(X, y)
+    model.set_params(warm_start=False)
+    return model
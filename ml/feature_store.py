@@ -0,0 +1,358 @@
+"""
+Lag, rolling-window and year-over-year features.
+
+Derived features are computed once per dataset version, with grouped pandas
+operations over each series, and materialized as a columnar sidecar next to
+the CSV (see write_columns). Training picks the columns of the feature groups
+selected on the Prediction tab; forecasting rebuilds the same features one
+step at a time from the tail of the history and the predictions so far
+(recursive multi-step prediction).
+
+Feature names encode their definition, for the source column x at period t:
+
+    Sales_lag2    x[t-2]
+    Sales_mean6   mean of x[t-6] .. x[t-1]
+    Sales_std6    sample std of x[t-6] .. x[t-1]
+    Sales_yoy     x[t-1] - x[t-1-periods_per_year]
+"""
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.instrumentation import count, span
+from ml.data_louder import (DEFAULT_DATA_PATH, dataset_fingerprint, load_and_preprocess_data,
+                            read_columns, resolve_chunksize, sidecar_dir, write_columns)
+
+# Bump whenever a feature definition changes so stored features are rebuilt
+FEATURE_STORE_VERSION = 1
+# Feature-store versions kept in memory at once
+FEATURE_CACHE_SIZE = 2
+
+# Features every model gets: calendar columns plus the spend/holiday drivers
+BASE_FEATURES = ['Year', 'Month', 'Quarter', 'DayOfYear', 'WeekOfYear', 'MarketingSpend', 'IsHoliday']
+
+# Prediction tab groups -> the source columns their features derive from.
+# Exogenous columns are optional in the CSV; groups without one are skipped.
+FEATURE_GROUPS = {
+    "Historical Sales Data": ['Sales'],
+    "Economic Indicators": ['EconomicIndex'],
+    "Competitor Activity": ['CompetitorPrice'],
+    "Website Traffic": ['WebsiteTraffic'],
+}
+TARGET_COLUMN = 'Sales'
+
+LAGS = (1, 2, 3)
+ROLLING_WINDOWS = (3, 6)
+# A feature is left out when its warm-up (the leading periods it is undefined
+# for) would drop more than this share of each series' history from training
+MAX_WARMUP_SHARE = 0.25
+
+_FEATURE_NAME = re.compile(r'^(?P<column>.+)_(?P<kind>lag|mean|std|yoy)(?P<param>\d*)$')
+
+_lock = threading.Lock()
+_feature_cache = OrderedDict()
+
+
+def periods_per_year(dates):
+    """Infers the grain of a date column: 12 for monthly, 52 weekly, 365 daily..."""
+    unique = np.unique(np.asarray(dates, dtype='datetime64[D]'))
+    if len(unique) < 2:
+        return 12
+    step = float(np.median(np.diff(unique).astype(float)))
+    return max(1, int(round(365.25 / step)))
+
+
+def series_keys(df):
+    """
+    Identifies the series each row belongs to: the 'Series' column if there
+    is one, otherwise the row's position within its date (files stacking
+    several stores list them in the same order on every date).
+    """
+    if 'Series' in df.columns:
+        return df['Series']
+    return df.groupby('Date', sort=False).cumcount()
+
+
+def derived_feature_names(column):
+    names = [f"{column}_lag{k}" for k in LAGS]
+    names += [f"{column}_{stat}{w}" for w in ROLLING_WINDOWS for stat in ('mean', 'std')]
+    return names + [f"{column}_yoy"]
+
+
+def parse_feature(name):
+    """Returns (column, kind, param) for a derived feature name, or None for a plain column."""
+    match = _FEATURE_NAME.match(name)
+    if match is None:
+        return None
+    return match['column'], match['kind'], int(match['param'] or 0)
+
+
+def feature_warmup(name, n_periods_per_year):
+    """Leading periods of each series for which a feature is undefined."""
+    column, kind, param = parse_feature(name)
+    return n_periods_per_year + 1 if kind == 'yoy' else param
+
+
+def _shift(values, k, position):
+    """values[t-k] within each series of the (series, date)-sorted `values`."""
+    shifted = np.full(len(values), np.nan)
+    shifted[k:] = values[:len(values) - k]
+    shifted[position < k] = np.nan
+    return shifted
+
+
+def build_feature_frame(df):
+    """
+    Adds the derived features of every source column present in `df` and
+    returns (frame, meta). Rows keep their order.
+
+    Rows are sorted once by (series, date) so every series is a contiguous
+    run; shifts and rolling windows then run over the whole column at once
+    and are masked where they would reach into the previous series.
+    """
+    n_periods_per_year = periods_per_year(df['Date'])
+    codes, _ = pd.factorize(series_keys(df))
+    order = np.lexsort((df['Date'].to_numpy(), codes))
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    position = np.arange(len(df)) - np.repeat(starts, np.diff(np.r_[starts, len(df)]))
+
+    frame = df.copy()
+    sources = [column for columns in FEATURE_GROUPS.values() for column in columns if column in df.columns]
+    derived = []
+    for column in sources:
+        values = df[column].to_numpy(dtype=float)[order]
+        features = {f"{column}_lag{k}": _shift(values, k, position) for k in LAGS}
+        # Windows end at the previous period, so no feature sees its own target
+        previous = pd.Series(features[f"{column}_lag1"])
+        for w in ROLLING_WINDOWS:
+            window = previous.rolling(w, min_periods=w)
+            for stat, result in (('mean', window.mean()), ('std', window.std())):
+                result = result.to_numpy(copy=True)
+                result[position < w] = np.nan
+                features[f"{column}_{stat}{w}"] = result
+        features[f"{column}_yoy"] = features[f"{column}_lag1"] - _shift(values, n_periods_per_year + 1, position)
+
+        for name, feature in features.items():
+            unsorted = np.empty(len(df))
+            unsorted[order] = feature
+            frame[name] = unsorted
+        derived += list(features)
+
+    n_periods = int(pd.Series(df['Date'].to_numpy()).nunique())
+    return frame, {"periods_per_year": n_periods_per_year, "derived": derived, "n_periods": n_periods}
+
+
+def load_feature_frame(filepath=DEFAULT_DATA_PATH, use_cache=True, chunksize=None):
+    """
+    Returns (frame, meta) for the current version of a data file: the
+    preprocessed data plus every derived feature. Features are rebuilt only
+    when the file (or FEATURE_STORE_VERSION) changes; otherwise they come
+    from memory or the on-disk store. `chunksize` is passed on to
+    load_and_preprocess_data (streamed files are stored separately, at the
+    monthly grain). Returns (None, None) if the data can't be loaded.
+    """
+    fingerprint = dataset_fingerprint(filepath)
+    if fingerprint is None:
+        print(f"Error: Data file not found at {filepath}")
+        return None, None
+
+    chunksize = resolve_chunksize(fingerprint, chunksize)
+    grain = 'monthly' if chunksize else 'raw'
+    directory = sidecar_dir(filepath, 'feature_store' if grain == 'raw' else 'feature_store_monthly')
+    cache_key = fingerprint + (grain,)
+    if use_cache:
+        with _lock:
+            cached = _feature_cache.get(cache_key)
+            if cached is not None:
+                _feature_cache.move_to_end(cache_key)
+        if cached is not None:
+            count("features.memory_cache_hit")
+            frame, meta = cached
+            return frame.copy(deep=False), meta
+
+        with span("features.store_read"):
+            frame, stored = read_columns(directory)
+        if frame is not None and (stored.get("version") == FEATURE_STORE_VERSION
+                                  and stored.get("fingerprint") == list(fingerprint)):
+            meta = stored["features"]
+            _remember(cache_key, frame, meta)
+            return frame.copy(deep=False), meta
+
+    df = load_and_preprocess_data(filepath, use_cache=use_cache, chunksize=chunksize)
+    if df is None:
+        return None, None
+    with span("features.build", rows=len(df)):
+        frame, meta = build_feature_frame(df)
+
+    if use_cache:
+        with span("features.store_write"):
+            try:
+                write_columns(directory, frame, {"version": FEATURE_STORE_VERSION,
+                                                 "fingerprint": list(fingerprint), "features": meta})
+            except OSError as e:
+                print(f"Warning: Could not write feature store for {filepath}: {e}")
+        _remember(cache_key, frame, meta)
+        frame = frame.copy(deep=False)
+    return frame, meta
+
+
+def _remember(cache_key, frame, meta):
+    with _lock:
+        _feature_cache[cache_key] = (frame, meta)
+        _feature_cache.move_to_end(cache_key)
+        while len(_feature_cache) > FEATURE_CACHE_SIZE:
+            _feature_cache.popitem(last=False)
+
+
+def select_features(selected_groups, meta):
+    """
+    Returns the model features for the Prediction tab's `selected_groups`:
+    BASE_FEATURES plus the derived features of each group's source columns,
+    leaving out any whose warm-up is too long for this history.
+    """
+    features = list(BASE_FEATURES)
+    n_periods_per_year = meta["periods_per_year"]
+    max_warmup = int(meta["n_periods"] * MAX_WARMUP_SHARE)
+    for group in selected_groups or []:
+        columns = [column for column in FEATURE_GROUPS.get(group, [])
+                   if f"{column}_lag1" in meta["derived"]]
+        if not columns:
+            print(f"Feature group '{group}' has no source column in the data; skipping it.")
+            continue
+        for column in columns:
+            for name in derived_feature_names(column):
+                if feature_warmup(name, n_periods_per_year) > max_warmup:
+                    print(f"Skipping {name}: needs {feature_warmup(name, n_periods_per_year)} periods "
+                          f"of history, more than {MAX_WARMUP_SHARE:.0%} of {meta['n_periods']}.")
+                    continue
+                features.append(name)
+    return features
+
+
+def required_history(features, n_periods_per_year):
+    """How many trailing periods of each source column recursive prediction needs."""
+    warmups = [feature_warmup(name, n_periods_per_year) for name in features if parse_feature(name)]
+    return max(warmups, default=0)
+
+
+def history_buffers(df, features, n_periods_per_year, keys=None):
+    """
+    Returns {source column: (n_paths, length) array} with the trailing history
+    recursive prediction starts from, one row per series in sorted key order
+    (rows for the same date are averaged). Without `keys` the whole frame is
+    one path, averaged across series per date. Short series are NaN-padded.
+    """
+    length = required_history(features, n_periods_per_year)
+    sources = sorted({parse_feature(name)[0] for name in features if parse_feature(name)})
+    if not sources:
+        return {}
+    if keys is None:
+        keys = np.zeros(len(df), dtype=np.int8)
+    grid = df[sources].astype(float).groupby([np.asarray(keys), df['Date'].to_numpy()]).mean()
+    buffers = {}
+    for column in sources:
+        matrix = grid[column].unstack().to_numpy()
+        # Right-align each series' own last `length` observations
+        tails = np.full((len(matrix), length), np.nan)
+        for row, values in enumerate(matrix):
+            values = values[~np.isnan(values)][-length:]
+            if len(values):
+                tails[row, length - len(values):] = values
+        buffers[column] = tails
+    return buffers
+
+
+def step_features(buffers, features, n_periods_per_year):
+    """Computes the derived features for the next period of every path from its buffer."""
+    columns = {}
+    for name in features:
+        parsed = parse_feature(name)
+        if parsed is None:
+            continue
+        column, kind, param = parsed
+        buffer = buffers[column]
+        if kind == 'lag':
+            columns[name] = buffer[:, -param]
+        elif kind == 'mean':
+            columns[name] = buffer[:, -param:].mean(axis=1)
+        elif kind == 'std':
+            columns[name] = buffer[:, -param:].std(axis=1, ddof=1)
+        else:
+            columns[name] = buffer[:, -1] - buffer[:, -1 - n_periods_per_year]
+    return columns
+
+
+def recursive_predict(model, features, future_frame, buffers, n_periods_per_year):
+    """
+    Forecasts `future_frame` (n_paths * horizon rows, path-major, with the
+    base feature columns) one step at a time: each step's derived features
+    come from the buffers, the step is predicted for every path in one
+    model.predict call, and predictions (or, for exogenous columns, the last
+    observed value) are appended to the buffers for the next step.
+
+    Returns (predictions, X): the flat predictions in future_frame's order and
+    the full feature matrix used, e.g. for prediction intervals.
+    """
+    buffers = {column: np.array(buffer, dtype=float) for column, buffer in buffers.items()}
+    n_paths = len(next(iter(buffers.values()))) if buffers else 1
+    horizon = len(future_frame) // n_paths
+    X = future_frame.reindex(columns=features).astype(float)
+    values = X.to_numpy(copy=True)
+    positions = {name: i for i, name in enumerate(features)}
+    predictions = np.empty(len(future_frame))
+
+    for step in range(horizon):
+        rows = np.arange(step, len(future_frame), horizon)
+        for name, column in step_features(buffers, features, n_periods_per_year).items():
+            values[rows, positions[name]] = column
+        step_predictions = model.predict(pd.DataFrame(values[rows], columns=features))
+        predictions[rows] = step_predictions
+        for column, buffer in buffers.items():
+            latest = step_predictions if column == TARGET_COLUMN else buffer[:, -1]
+            buffers[column] = np.column_stack([buffer[:, 1:], latest])
+    return predictions, pd.DataFrame(values, columns=features)
+
+
+def recursive_evaluate(model, features, df_history, df_future, n_periods_per_year, history_keys, future_keys):
+    """
+    Predicts the rows of `df_future` (the periods right after `df_history`,
+    with their observed base features) as they would have been forecast at
+    the end of `df_history`: recursively, each series from its own history,
+    so the derived features never see the actual values being scored.
+
+    Returns (predictions, X) in df_future's row order. Rows of series with no
+    history are predicted from their own features.
+    """
+    buffers = history_buffers(df_history, features, n_periods_per_year, history_keys)
+    paths = np.unique(np.asarray(history_keys))
+    future_keys = np.asarray(future_keys)
+    dates, step = np.unique(df_future['Date'].to_numpy(), return_inverse=True)
+    path = np.minimum(np.searchsorted(paths, future_keys), len(paths) - 1)
+    known = paths[path] == future_keys
+
+    # One row per (path, step); a path missing a period borrows that period's
+    # first row, whose prediction is then not used
+    first_rows = np.zeros(len(dates), dtype=np.int64)
+    first_rows[step[::-1]] = np.arange(len(df_future))[::-1]
+    grid = np.tile(first_rows, (len(paths), 1))
+    grid[path[known], step[known]] = np.flatnonzero(known)
+    future_frame = df_future.iloc[grid.ravel()].reset_index(drop=True)
+    predictions, X = recursive_predict(model, features, future_frame, buffers, n_periods_per_year)
+
+    X_future = df_future[features].astype(float)
+    values = X_future.to_numpy(copy=True)
+    result = np.empty(len(df_future))
+    if (~known).any():
+        result[~known] = model.predict(X_future[~known])
+    cells = path[known] * len(dates) + step[known]
+    result[known] = predictions[cells]
+    values[known] = X.to_numpy()[cells]
+    return result, pd.DataFrame(values, columns=features, index=df_future.index)
+
+
+def has_derived_features(features):
+    return any(parse_feature(name) for name in features)
@@ -0,0 +1,47 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Most recent forecasts kept in memory, and how long (seconds) each stays valid
+FORECAST_CACHE_SIZE = 32
+FORECAST_CACHE_TTL = 300.0
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+def forecast_cache_key(model_id, fingerprint, horizon, scenario):
+    """
+    Builds a cache key for a forecast. `scenario` is any hashable description
+    of the scenario inputs (e.g. a tuple of spend multiplier and overrides).
+    """
+    return (model_id, fingerprint, horizon, scenario)
+
+
+def get_cached_forecast(key):
+    """Returns the cached forecast for `key`, or None if absent or expired."""
+    with _lock:
+        item = _cache.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        if time.monotonic() - stored_at > FORECAST_CACHE_TTL:
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return value
+
+
+def cache_forecast(key, value):
+    """Stores a forecast, evicting the least recently used ones beyond the limit."""
+    with _lock:
+        _cache[key] = (time.monotonic(), value)
+        _cache.move_to_end(key)
+        while len(_cache) > FORECAST_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def clear_forecast_cache():
+    """Drops every cached forecast (called when a new model is registered)."""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+# Supported forecast frequencies (pandas aliases) and their step sizes
+FREQUENCIES = {'D': 'daily', 'W': 'weekly', 'MS': 'monthly'}
+
+DEFAULT_HOLIDAY_MONTHS = (1, 5, 7, 12)
+
+
+def month_holiday_lookup(holiday_months=DEFAULT_HOLIDAY_MONTHS):
+    """
+    Precomputes a holiday calendar as a 13-entry lookup array indexed by month
+    number (entry 0 is unused), so flags are a single fancy-index.
+    """
+    lookup = np.zeros(13, dtype=np.int8)
+    lookup[list(holiday_months)] = 1
+    return lookup
+
+
+def date_holiday_lookup(holiday_dates):
+    """Precomputes a calendar of specific holiday dates as a sorted datetime64[D] array."""
+    return np.unique(np.asarray(pd.to_datetime(list(holiday_dates)), dtype='datetime64[D]'))
+
+
+DEFAULT_HOLIDAY_CALENDAR = month_holiday_lookup()
+
+
+def holiday_flags(dates, months, calendar=None):
+    """
+    Returns int8 holiday flags for datetime64 `dates`. `calendar` is either a
+    month lookup from month_holiday_lookup or a date array from
+    date_holiday_lookup (default: DEFAULT_HOLIDAY_CALENDAR).
+    """
+    if calendar is None:
+        calendar = DEFAULT_HOLIDAY_CALENDAR
+    calendar = np.asarray(calendar)
+    if calendar.dtype.kind == 'M':
+        days = dates.astype('datetime64[D]')
+        if not len(calendar):
+            return np.zeros(len(days), dtype=np.int8)
+        positions = np.searchsorted(calendar, days).clip(max=len(calendar) - 1)
+        return (calendar[positions] == days).astype(np.int8)
+    return calendar[months].astype(np.int8)
+
+
+def _iso_weeks_in_year(years):
+    # A year has 53 ISO weeks if it starts on a Thursday, or is a leap year
+    # starting on a Wednesday (p is the weekday-of-Dec-31 term of that rule).
+    def p(y):
+        return (y + y // 4 - y // 100 + y // 400) % 7
+    return 52 + ((p(years) == 4) | (p(years - 1) == 3))
+
+
+def calendar_features(dates):
+    """
+    Computes Year, Month, Quarter, DayOfYear and ISO WeekOfYear for a
+    datetime64 array with integer arithmetic only (no per-element Python).
+    """
+    days = dates.astype('datetime64[D]')
+    years = days.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    day_of_year = (days - days.astype('datetime64[Y]')).astype(np.int64) + 1
+
+    # ISO 8601 week: 1970-01-01 was a Thursday, so Monday=1 ... Sunday=7 is:
+    weekday = (days.astype(np.int64) + 3) % 7 + 1
+    weeks = (day_of_year - weekday + 10) // 7
+    weeks = np.where(weeks > _iso_weeks_in_year(years), 1, weeks)
+    weeks = np.where(weeks < 1, _iso_weeks_in_year(years - 1), weeks)
+
+    return {
+        'Year': years,
+        'Month': months,
+        'Quarter': (months - 1) // 3 + 1,
+        'DayOfYear': day_of_year,
+        'WeekOfYear': weeks,
+    }
+
+
+def future_dates(last_dates, horizon, freq='MS'):
+    """
+    Returns an (n_series, horizon) datetime64 array of the `horizon` periods
+    following each series' last observed date.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unsupported frequency: {freq}")
+    last_dates = np.asarray(pd.to_datetime(np.atleast_1d(last_dates)), dtype='datetime64[D]')
+    steps = np.arange(1, horizon + 1)
+    if freq == 'MS':
+        month_index = last_dates.astype('datetime64[M]').astype(np.int64)
+        return (month_index[:, None] + steps).astype('datetime64[M]').astype('datetime64[D]')
+    step_days = 7 if freq == 'W' else 1
+    return last_dates[:, None] + steps * step_days
+
+
+def build_future_features(last_dates, horizon, freq='MS', marketing_spend=0.0,
+                          holiday_calendar=None, series_ids=None, series_column='Series'):
+    """
+    Builds the feature frame for forecasting `horizon` periods after each of
+    `last_dates` (one per series), ordered by series then date.
+
+    marketing_spend is broadcast to (n_series, horizon): pass a scalar, a
+    per-step array of length horizon, a per-series column of shape
+    (n_series, 1), or a full matrix. If series_ids is given it is added as
+    `series_column`.
+    """
+    dates = future_dates(last_dates, horizon, freq)
+    n_series = dates.shape[0]
+    flat_dates = dates.ravel()
+
+    features = calendar_features(flat_dates)
+    spend = np.broadcast_to(np.asarray(marketing_spend, dtype=float), (n_series, horizon))
+
+    frame = {}
+    if series_ids is not None:
+        frame[series_column] = np.repeat(np.asarray(series_ids), horizon)
+    frame['Date'] = flat_dates.astype('datetime64[ns]')
+    frame.update(features)
+    frame['MarketingSpend'] = spend.ravel()
+    frame['IsHoliday'] = holiday_flags(flat_dates, features['Month'], holiday_calendar)
+    return pd.DataFrame(frame)
@@ -0,0 +1,148 @@
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from ml.estimators import make_estimator
+
+INTERVAL_METHODS = ['quantile', 'bootstrap']
+DEFAULT_INTERVAL_METHOD = 'quantile'
+# Central probability covered by the band (0.8 = 10th to 90th percentile)
+DEFAULT_INTERVAL_LEVEL = 0.8
+DEFAULT_BOOTSTRAP_REPLICATES = 30
+
+
+def interval_quantiles(level=DEFAULT_INTERVAL_LEVEL):
+    """Returns the (lower, upper) quantiles of a central interval."""
+    tail = (1 - level) / 2
+    return tail, 1 - tail
+
+
+def _fit_quantile_model(X, y, quantile, params):
+    model = HistGradientBoostingRegressor(loss='quantile', quantile=quantile, random_state=42, **params)
+    return model.fit(X, y)
+
+
+def fit_quantile_models(X, y, level=DEFAULT_INTERVAL_LEVEL, params=None, n_jobs=-1):
+    """
+    Fits lower, median and upper quantile-loss histogram boosting models side
+    by side in a process pool (sequentially on a single core, where a pool
+    only adds overhead). Returns the interval bundle for predict_interval.
+
+    Only the spread of the quantiles around their median is used: the band is
+    placed around the main model's prediction, since quantile models fitted
+    on the past can't follow a trend the main model picks up.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    params = dict(params or {})
+    # The default leaf size (20) would leave small histories with a single leaf
+    params.setdefault('min_samples_leaf', max(1, min(20, len(X) // 10)))
+
+    low, high = interval_quantiles(level)
+    lower, median, upper = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_quantile_model)(X, y, quantile, params) for quantile in (low, 0.5, high)
+    )
+    return {"method": "quantile", "level": level, "lower": lower, "median": median, "upper": upper}
+
+
+def _fit_bootstrap_replicate(algorithm, params, X, y_fitted, residuals, seed):
+    # Each worker draws its own pseudo-target from the shared arrays, so only
+    # the seed differs between tasks.
+    rng = np.random.default_rng(seed)
+    y_star = y_fitted + rng.choice(residuals, size=len(y_fitted))
+    return make_estimator(algorithm, params, random_state=seed).fit(X, y_star)
+
+
+def fit_bootstrap_models(algorithm, params, X, y_fitted, residuals, level=DEFAULT_INTERVAL_LEVEL,
+                         n_replicates=DEFAULT_BOOTSTRAP_REPLICATES, n_jobs=-1, random_state=42):
+    """
+    Residual bootstrap: refits the main algorithm n_replicates times on its
+    own fitted values plus resampled residuals, across a process pool.
+
+    `y_fitted` are the main model's predictions on X and `residuals` its
+    out-of-sample errors. X is identical for every replicate, so joblib
+    memory-maps it (and the other arrays) into the workers once.
+    """
+    X = np.asarray(X, dtype=float)
+    y_fitted = np.asarray(y_fitted, dtype=float)
+    residuals = np.asarray(residuals, dtype=float)
+    seeds = np.random.default_rng(random_state).integers(0, 2**31 - 1, size=n_replicates)
+
+    replicates = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_bootstrap_replicate)(algorithm, params, X, y_fitted, residuals, int(seed))
+        for seed in seeds
+    )
+    return {"method": "bootstrap", "level": level, "replicates": replicates, "residuals": residuals}
+
+
+def fit_intervals(method, X, y, model=None, algorithm=None, params=None, residuals=None,
+                  level=DEFAULT_INTERVAL_LEVEL, n_jobs=-1, n_replicates=DEFAULT_BOOTSTRAP_REPLICATES):
+    """
+    Fits the interval bundle for `method` ('quantile' or 'bootstrap').
+    Bootstrap needs the fitted main `model`, its `algorithm`/`params` and
+    out-of-sample `residuals`.
+    """
+    if method == 'quantile':
+        return fit_quantile_models(X, y, level, n_jobs=n_jobs)
+    if method == 'bootstrap':
+        return fit_bootstrap_models(algorithm, params, X, model.predict(X), residuals, level,
+                                    n_replicates=n_replicates, n_jobs=n_jobs)
+    raise ValueError(f"Unknown interval method: {method}")
+
+
+def _band_offsets(bands, X, random_state=0):
+    """Returns the (lower, upper) spread of the band around its center for each row of X."""
+    # The interval models are fitted on plain arrays
+    X = np.asarray(X, dtype=float)
+    if bands["method"] == "quantile":
+        lower, upper = bands["lower"].predict(X), bands["upper"].predict(X)
+        # Separately fitted quantiles can cross; keep the band ordered
+        lower, upper = np.minimum(lower, upper), np.maximum(lower, upper)
+        # Bundles saved before the median model was added are centered on the midpoint
+        center = np.clip(bands["median"].predict(X), lower, upper) if "median" in bands else (lower + upper) / 2
+        return lower - center, upper - center
+
+    # Bootstrap: spread of the refitted models plus resampled noise
+    predictions = np.stack([model.predict(X) for model in bands["replicates"]])
+    center = predictions.mean(axis=0)
+    rng = np.random.default_rng(random_state)
+    predictions += rng.choice(bands["residuals"], size=predictions.shape)
+    lower, upper = np.quantile(predictions - center, interval_quantiles(bands["level"]), axis=0)
+    return lower, upper
+
+
+def predict_interval(bands, X, point, random_state=0):
+    """
+    Returns (lower, upper) prediction bounds for X around the main model's
+    predictions `point`, widened by the bundle's calibrated margin (see
+    calibrate_intervals). The band always contains the point prediction.
+    """
+    point = np.asarray(point, dtype=float)
+    low, high = _band_offsets(bands, X, random_state)
+    margin = bands.get("margin", 0.0)
+    return np.minimum(point + low - margin, point), np.maximum(point + high + margin, point)
+
+
+def calibrate_intervals(bands, X, y, point):
+    """
+    Split-conformal calibration on held-out rows: returns a copy of `bands`
+    with the margin by which the band must grow so that a `level` share of
+    these rows falls inside it. The band is never narrowed; with as few
+    held-out rows as small histories leave, that would rest on one or two
+    errors.
+    """
+    y = np.asarray(y, dtype=float)
+    if not len(y):
+        return bands
+    lower, upper = predict_interval(dict(bands, margin=0.0), X, point)
+    scores = np.maximum(lower - y, y - upper)
+    # Finite-sample correction: the ceil((n + 1) * level)-th smallest score
+    rank = min(1.0, np.ceil((len(y) + 1) * bands["level"]) / len(y))
+    return dict(bands, margin=max(0.0, float(np.quantile(scores, rank, method='higher'))))
+
+
+def interval_coverage(bands, X, y, point):
+    """Share of `y` that falls inside the band predicted around `point`."""
+    lower, upper = predict_interval(bands, X, point)
+    y = np.asarray(y, dtype=float)
+    return float(np.mean((y >= lower) & (y <= upper)))
@@ -1,63 +1,354 @@
-import os
-import time
-import joblib
+import copy
+
 import numpy as np
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.model_selection import train_test_split
+import pandas as pd
 from sklearn.metrics import mean_squared_error
 
-from ml.data_louder import load_and_preprocess_data
+from core.instrumentation import is_enabled, snapshot, span, traced
+from ml.backtest import run_backtest
+from ml.data_louder import dataset_fingerprint, resolve_chunksize
+from ml.feature_store import (has_derived_features, load_feature_frame, recursive_evaluate, select_features,
+                              series_keys)
+from ml.estimators import (EARLY_STOPPING_MIN_ROWS, fit_estimator, make_estimator, n_fitted_stages,
+                           supports_incremental, update_model)
+from ml.intervals import DEFAULT_INTERVAL_METHOD, calibrate_intervals, fit_intervals, interval_coverage
+from ml.artifacts import DEFAULT_COMPRESSION, parse_compression
+from ml.model_registry import get_model_entry, load_model, register_model
+from ml.model_search import run_search
+
+# How many search results to keep with the registered model
+LEADERBOARD_SIZE = 10
+# Share of the most recent periods held out to score the model and its intervals
+HOLDOUT_SHARE = 0.2
+# Incremental updates fall back to a full refit when the previous model's
+# RMSE on the new rows exceeds its recorded RMSE by more than this factor
+DRIFT_THRESHOLD = 1.5
+
+
+def holdout_split(dates, share=HOLDOUT_SHARE):
+    """
+    Splits rows into training and hold-out on whole periods: the hold-out is
+    the last `share` of the distinct dates, so rows of several series sharing
+    a date always land on the same side. Returns (train positions, hold-out
+    positions in date order, last training date).
+    """
+    dates = np.asarray(dates)
+    unique_dates = np.unique(dates)
+    if len(unique_dates) < 2:
+        raise ValueError("At least two periods of history are needed to hold some out.")
+    n_holdout = min(max(1, int(np.ceil(len(unique_dates) * share))), len(unique_dates) - 1)
+    cutoff = unique_dates[-n_holdout]
+    train_rows = np.flatnonzero(dates < cutoff)
+    holdout_rows = np.flatnonzero(dates >= cutoff)
+    holdout_rows = holdout_rows[np.argsort(dates[holdout_rows], kind='stable')]
+    return train_rows, holdout_rows, unique_dates[-n_holdout - 1]
+
 
-def train_model(selected_features, algorithm_choice, hyperparameters):
+def _incremental_update(df, features, target, hyperparameters):
+    """
+    Extends the latest registered model with the rows that arrived since it
+    was trained. Returns the registered results, or None if a full refit is
+    needed (no usable previous model, or the new data has drifted).
+    """
+    entry = get_model_entry()
+    if (entry is None or not entry.get("trained_through") or entry.get("features") != features
+            or entry.get("chunksize", 0) != hyperparameters['chunksize']):
+        print("Incremental: no compatible previous model, running a full fit.")
+        return None
+
+    model, entry = load_model(entry["model_id"])
+    if not supports_incremental(model):
+        print(f"Incremental: {entry['algorithm']} models can't be updated, running a full fit.")
+        return None
+
+    trained_through = pd.Timestamp(entry["trained_through"])
+    is_new = (df['Date'] > trained_through).to_numpy()
+    if not is_new.any():
+        return {"error": f"No new data since {trained_through.date()}; model {entry['model_id']} is current."}
+
+    X, y = df[features], df[target]
+    X_new, y_new = X[is_new], y[is_new]
+
+    # The previous model has never seen these rows, so this is an honest
+    # out-of-sample error and doubles as the drift check.
+    rmse = np.sqrt(mean_squared_error(y_new, model.predict(X_new)))
+    threshold = hyperparameters.get('drift_threshold', DRIFT_THRESHOLD)
+    if entry.get("rmse") and rmse > entry["rmse"] * threshold:
+        print(f"Incremental: RMSE on new rows {rmse:,.2f} exceeds {threshold}x the "
+              f"previous {entry['rmse']:,.2f}; running a full fit.")
+        return None
+
+    # The registry caches the loaded estimator, so update a private copy
+    model = update_model(
+        copy.deepcopy(model), X, y, X_new, y_new,
+        extra_stages=hyperparameters.get('incremental_stages', 50)
+    )
+    print(f"Incremental: updated with {int(is_new.sum())} new rows (RMSE on new rows {rmse:.2f}).")
+
+    params = dict(entry.get("hyperparameters") or {})
+    stages = n_fitted_stages(model)
+    if stages is not None:
+        params["n_estimators"] = stages
+    extra = {"trained_through": str(df['Date'].max()), "n_train_rows": len(df),
+             "parent_model_id": entry["model_id"], "chunksize": hyperparameters['chunksize']}
+    # The parent's prediction intervals still describe the updated model
+    for key in ("companions", "companion_sha256", "interval_method", "interval_level", "interval_coverage",
+                "feature_groups", "periods_per_year"):
+        if entry.get(key) is not None:
+            extra[key] = entry[key]
+    new_entry = register_model(
+        model, features, rmse=rmse, algorithm=entry["algorithm"], hyperparameters=params, extra=extra,
+        compression=hyperparameters.get('compression', DEFAULT_COMPRESSION)
+    )
+    return {
+        "rmse": f"{rmse:,.2f}",
+        "model_id": new_entry["model_id"],
+        "features_used": features,
+        "algorithm": entry["algorithm"],
+        "leaderboard": None,
+        "incremental": True
+    }
+
+
+@traced("train.train_model")
+def train_model(selected_features, algorithm_choice, hyperparameters, progress_callback=None):
     """
     Trains a real machine learning model and saves it.
+
+    selected_features names Prediction tab feature groups (see
+    ml.feature_store.FEATURE_GROUPS); their lag, rolling and YoY features are
+    read from the feature store and added to the calendar/spend base features.
+
+    algorithm_choice is one of ml.estimators.ALGORITHMS. hyperparameters may
+    set 'max_training' (1-100, percent of the n_estimators iteration budget)
+    and 'time_budget' (seconds of wall-clock fitting); boosting also stops
+    early on a validation split once there are enough rows.
+
+    hyperparameters['intervals'] ('quantile', 'bootstrap' or None, default
+    'quantile') selects the prediction-interval models trained in a process
+    pool after the main fit and registered alongside it.
+
+    With hyperparameters['backtest_folds'] set, the chosen configuration is
+    also backtested over that many rolling origins (default 0, off; see
+    ml.backtest) and the per-horizon errors are stored in the registry.
+
+    hyperparameters['compression'] picks the model artifact compression (see
+    ml.artifacts; default: lz4 if installed, else none).
+
+    hyperparameters['chunksize'] streams the data file in chunks of that many
+    rows, aggregated to months (default: automatic for large files, see
+    ml.data_louder). The choice is recorded so forecasts load the data the
+    same way.
+
+    With hyperparameters['incremental'] set, the latest registered model is
+    extended with only the rows added since it was trained (see
+    _incremental_update), falling back to a full fit on drift.
+
+    If hyperparameters contains 'search' ('grid', 'random' or 'halving'), the
+    candidates for hyperparameters['algorithms'] (default: algorithm_choice)
+    are cross-validated across a process pool first and the best one is
+    trained and registered.
+
+    progress_callback(percent, result=None) receives real progress: search
+    candidates as they finish (with their result dict) and then boosting
+    stages / trees as they are fitted.
     """
     print("--- Starting Real Model Training ---")
-    
-    # 1. Load Data
-    df = load_and_preprocess_data()
+    # Reject a bad compression setting now rather than after fitting; the
+    # resolved form also keeps the lz4 fallback notice from repeating
+    try:
+        method, level = parse_compression(hyperparameters.get('compression', DEFAULT_COMPRESSION))
+    except ValueError as e:
+        return {"error": str(e)}
+    hyperparameters = dict(hyperparameters, compression=method if method == 'none' else f"{method}:{level}")
+    last_percent = [-1]
+
+    def report(percent, result=None):
+        # Fitting reports per stage; only forward changes to keep signals cheap
+        if progress_callback and (percent != last_percent[0] or result is not None):
+            last_percent[0] = percent
+            progress_callback(percent, result)
+
+    # 1. Load Data, with the derived features precomputed in the feature store
+    fingerprint = dataset_fingerprint()
+    if fingerprint is None:
+        return {"error": "Failed to load data."}
+    hyperparameters['chunksize'] = resolve_chunksize(fingerprint, hyperparameters.get('chunksize'))
+    df, feature_meta = load_feature_frame(chunksize=hyperparameters['chunksize'])
     if df is None:
         return {"error": "Failed to load data."}
+    report(5)
 
     # 2. Define Features (X) and Target (y)
-    features = ['Year', 'Month', 'Quarter', 'MarketingSpend', 'IsHoliday']
+    features = select_features(selected_features, feature_meta)
     target = 'Sales'
+    # Lag and rolling features are undefined for the first periods of each series
+    complete = df[features + [target]].notna().all(axis=1)
+    if not complete.all():
+        df = df[complete]
     
     X = df[features]
     y = df[target]
 
-    # Split data for validation
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
+    if hyperparameters.get('incremental'):
+        results = _incremental_update(df, features, target, hyperparameters)
+        if results is not None:
+            return results
+
+    # Split data for validation on whole periods, so every row of the last
+    # trained date is in training and an incremental update can start after it
+    try:
+        train_rows, test_rows, trained_through = holdout_split(df['Date'].to_numpy())
+    except ValueError as e:
+        return {"error": str(e)}
+    X_train, X_test = X.iloc[train_rows], X.iloc[test_rows]
+    y_train, y_test = y.iloc[train_rows], y.iloc[test_rows]
 
     # 3. Initialize and Train Model
-    # Here you could have logic to switch between algorithms based on algorithm_choice
-    model = GradientBoostingRegressor(
-        n_estimators=hyperparameters.get('n_estimators', 100),
-        random_state=42
+    search_mode = hyperparameters.get('search')
+    leaderboard = None
+    if search_mode:
+        def on_result(result, done, total):
+            print(f"Search {done}/{total}: {result['algorithm']} {result['params']} "
+                  f"CV RMSE {result['rmse']:,.2f}")
+            report(5 + int(60 * done / total), result)
+
+        with span("train.search", mode=search_mode):
+            leaderboard = run_search(
+                X_train, y_train,
+                algorithms=hyperparameters.get('algorithms') or [algorithm_choice],
+                mode=search_mode,
+                n_iter=hyperparameters.get('n_iter', 10),
+                n_splits=hyperparameters.get('cv_splits', 3),
+                n_jobs=hyperparameters.get('n_jobs', -1),
+                on_result=on_result,
+            )[:LEADERBOARD_SIZE]
+        algorithm_choice = leaderboard[0]['algorithm']
+        params = leaderboard[0]['params']
+    else:
+        # The "Max Training" slider caps the share of the iteration budget used
+        max_training = min(max(hyperparameters.get('max_training', 100), 1), 100)
+        n_estimators = hyperparameters.get('n_estimators', 100)
+        params = {"n_estimators": max(1, n_estimators * max_training // 100)}
+        if algorithm_choice == 'Neural Network':
+            params = {}
+
+    fit_start = 65 if search_mode else 5
+    model = make_estimator(
+        algorithm_choice, params, n_jobs=-1,
+        early_stopping=len(X_train) >= EARLY_STOPPING_MIN_ROWS
     )
-    
-    model.fit(X_train, y_train)
-    print("Model fitting complete.")
+    with span("train.fit", algorithm=algorithm_choice, rows=len(X_train)) as fit_span:
+        fit_estimator(
+            model, X_train, y_train, time_budget=hyperparameters.get('time_budget'),
+            stage_callback=lambda done, total: report(fit_start + (95 - fit_start) * done // total)
+        )
+        stages = n_fitted_stages(model)
+        fit_span.set(stages=stages)
+    if stages is not None:
+        print(f"Model fitting complete ({algorithm_choice}, {stages} stages).")
+    else:
+        print(f"Model fitting complete ({algorithm_choice}).")
 
-    # 4. Evaluate Model
-    predictions = model.predict(X_test)
+    # 4. Evaluate Model. Lag/rolling features are forecast recursively from
+    # the training periods, as they are in production, rather than read off
+    # the actual hold-out values
+    with span("train.evaluate", rows=len(X_test)):
+        if has_derived_features(features):
+            keys = np.asarray(series_keys(df))
+            predictions, X_test = recursive_evaluate(
+                model, features, df.iloc[train_rows], df.iloc[test_rows], feature_meta["periods_per_year"],
+                keys[train_rows], keys[test_rows]
+            )
+        else:
+            predictions = model.predict(X_test)
     rmse = np.sqrt(mean_squared_error(y_test, predictions))
     print(f"Model evaluation RMSE: {rmse:.2f}")
 
-    # 5. Save the Trained Model
-    model_dir = 'models'
-    if not os.path.exists(model_dir):
-        os.makedirs(model_dir)
-    
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    model_filename = f"sales_model_{timestamp}.joblib"
-    model_path = os.path.join(model_dir, model_filename)
-    joblib.dump(model, model_path)
-    print(f"Model saved to {model_path}")
+    # 5. Fit prediction intervals and check their coverage on the hold-out
+    extra = {"trained_through": str(pd.Timestamp(trained_through)), "n_train_rows": len(X_train),
+             "feature_groups": list(selected_features or []),
+             "periods_per_year": feature_meta["periods_per_year"], "chunksize": hyperparameters['chunksize']}
+    companions = {}
+    interval_method = hyperparameters.get('intervals', DEFAULT_INTERVAL_METHOD)
+    if interval_method:
+        # The earlier half of the hold-out calibrates the band; coverage is
+        # measured on the later half, which the band hasn't seen
+        n_calibration = max(1, len(X_test) // 2)
+        with span("train.intervals", method=interval_method):
+            bands = fit_intervals(
+                interval_method, X_train, y_train, model=model, algorithm=algorithm_choice,
+                params=params, residuals=y_test.to_numpy()[:n_calibration] - predictions[:n_calibration],
+                n_jobs=hyperparameters.get('n_jobs', -1)
+            )
+            bands = calibrate_intervals(bands, X_test[:n_calibration], y_test[:n_calibration],
+                                        predictions[:n_calibration])
+        if len(X_test) > n_calibration:
+            coverage = interval_coverage(bands, X_test[n_calibration:], y_test[n_calibration:],
+                                         predictions[n_calibration:])
+        else:
+            coverage = interval_coverage(bands, X_test, y_test, predictions)
+        print(f"{interval_method.capitalize()} {bands['level']:.0%} interval hold-out coverage: {coverage:.0%}")
+        companions["intervals"] = bands
+        extra.update(interval_method=interval_method, interval_level=bands['level'],
+                     interval_coverage=coverage)
+    report(97)
+
+    # 6. Rolling-origin backtest of the same configuration
+    n_folds = hyperparameters.get('backtest_folds', 0)
+    if n_folds:
+        with span("train.backtest", folds=n_folds):
+            backtest = run_backtest(
+                df, features, algorithm_choice, params, target=target, n_folds=n_folds,
+                mode=hyperparameters.get('backtest_mode', 'expanding'),
+                n_jobs=hyperparameters.get('n_jobs', -1)
+            )
+        if backtest.get("error"):
+            print(f"Backtest skipped: {backtest['error']}")
+        else:
+            overall = backtest["overall"]
+            print(f"Backtest over {len(backtest['cutoffs'])} origins: RMSE {overall['rmse']:,.2f}, "
+                  f"WAPE {overall['wape']:.1f}%")
+            extra["backtest"] = backtest
+    report(99)
 
-    # 6. Return results for the UI
+    # 7. Save and register the Trained Model
+    if search_mode:
+        extra.update(search=search_mode, leaderboard=leaderboard)
+    with span("train.register"):
+        entry = register_model(
+            model, features, rmse=rmse, algorithm=algorithm_choice,
+            hyperparameters=params, extra=extra, companions=companions,
+            compression=hyperparameters.get('compression', DEFAULT_COMPRESSION)
+        )
+
+    # 8. Return results for the UI
     return {
         "rmse": f"{rmse:,.2f}",
-        "model_id": model_filename,
-        "features_used": features
-    }
\ No newline at end of file
+        "model_id": entry["model_id"],
+        "features_used": features,
+        "algorithm": algorithm_choice,
+        "leaderboard": leaderboard,
+        "interval_coverage": extra.get("interval_coverage"),
+        "backtest": extra.get("backtest")
+    }
+
+
+def train_model_process(queue, selected_features, algorithm_choice, hyperparameters):
+    """
+    Runs train_model in a child process, posting ('progress', percent, result)
+    messages while it runs and a final ('finished', results) message. Running
+    training out of process lets the UI terminate it mid-fit.
+    """
+    try:
+        results = train_model(
+            selected_features, algorithm_choice, hyperparameters,
+            progress_callback=lambda percent, result=None: queue.put(('progress', percent, result))
+        )
+    except Exception as e:
+        print(f"Error during training: {e}")
+        results = {"error": str(e)}
+    if is_enabled():
+        # Spans recorded in this process, for the parent's diagnostics
+        results["instrumentation"] = snapshot()
+    queue.put(('finished', results))
@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: registrations are only serialised within one process
+    fcntl = None
+
+from core.instrumentation import count, span
+from ml.artifacts import ARTIFACT_EXTENSION, DEFAULT_COMPRESSION, dump_artifact, load_artifact
+from ml.forecast_cache import clear_forecast_cache
+
+MODEL_DIR = 'models'
+MANIFEST_NAME = 'registry.json'
+
+# How many loaded estimators (and companion artifacts) to keep in memory
+MODEL_CACHE_SIZE = 8
+# Registered models kept on disk; older ones are pruned after each registration
+MODEL_RETENTION = 10
+# Unregistered model files younger than this may still be mid-registration
+ORPHAN_GRACE_SECONDS = 3600
+
+_lock = threading.RLock()
+_manifest = None
+_manifest_stamp = None
+_model_cache = OrderedDict()
+
+
+def _manifest_path(model_dir=MODEL_DIR):
+    return os.path.join(model_dir, MANIFEST_NAME)
+
+
+@contextmanager
+def _manifest_lock(model_dir=MODEL_DIR):
+    """
+    Serialises read-modify-write cycles of the manifest between threads and,
+    through an flock on registry.json.lock, between processes (the UI, the
+    CLI and the forecast server can all register or prune models).
+    """
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(model_dir, exist_ok=True)
+        with open(_manifest_path(model_dir) + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _scan_legacy_models(model_dir):
+    """Builds manifest entries for model files saved before the registry existed."""
+    if not os.path.exists(model_dir):
+        return []
+    # Companion artifacts are saved as <model>.<name>.joblib
+    files = sorted(f for f in os.listdir(model_dir) if f.endswith('.joblib') and f.count('.') == 1)
+    return [{"model_id": f, "filename": f, "timestamp": None, "features": None,
+             "rmse": None, "algorithm": None, "hyperparameters": {}, "sha256": None}
+            for f in files]
+
+
+def _read_manifest(model_dir=MODEL_DIR, fresh=False):
+    """
+    Returns the list of registered model entries, oldest first. The parsed
+    manifest is kept in memory and only re-read when the file changes on disk,
+    so registrations from other processes are still picked up. `fresh` always
+    re-reads it, for updates made under _manifest_lock (mtimes can be too
+    coarse to tell two quick writes apart).
+    """
+    global _manifest, _manifest_stamp
+    path = _manifest_path(model_dir)
+    try:
+        stat = os.stat(path)
+        stamp = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        stamp = None
+
+    with _lock:
+        if not fresh and _manifest is not None and stamp == _manifest_stamp and stamp is not None:
+            return _manifest
+        if stamp is None:
+            entries = _scan_legacy_models(model_dir)
+        else:
+            with open(path) as f:
+                entries = json.load(f)["models"]
+        _manifest, _manifest_stamp = entries, stamp
+        return entries
+
+
+def _write_manifest(entries, model_dir=MODEL_DIR):
+    path = _manifest_path(model_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({"models": entries}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def list_models(model_dir=MODEL_DIR):
+    """Returns all registered model entries, oldest first."""
+    return list(_read_manifest(model_dir))
+
+
+def get_model_entry(model_id=None, model_dir=MODEL_DIR):
+    """Returns the entry for `model_id`, or for the latest model if None."""
+    entries = _read_manifest(model_dir)
+    if not entries:
+        return None
+    if model_id is None:
+        return entries[-1]
+    for entry in entries:
+        if entry["model_id"] == model_id:
+            return entry
+    return None
+
+
+def get_model_path(entry, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, entry["filename"])
+
+
+def register_model(model, features, rmse=None, algorithm=None, hyperparameters=None,
+                   extra=None, companions=None, compression=DEFAULT_COMPRESSION,
+                   retention=MODEL_RETENTION, model_dir=MODEL_DIR):
+    """
+    Saves a trained estimator into the models directory and records it in the
+    manifest. Returns the new manifest entry.
+
+    `companions` maps a name to an extra artifact trained alongside the model
+    (e.g. 'intervals'); each is saved next to it as <model>.<name>.artifact and
+    loaded with load_companion. Files are written in the ml.artifacts format
+    with `compression`, and their SHA-256 is recorded so loads can verify
+    them. Afterwards only the newest `retention` models are kept (None keeps
+    everything).
+    """
+    if not os.path.exists(model_dir):
+        os.makedirs(model_dir)
+
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    model_filename = f"sales_model_{timestamp}{ARTIFACT_EXTENSION}"
+    suffix = 1
+    # Claim the name atomically: another process may register in the same second
+    while True:
+        model_path = os.path.join(model_dir, model_filename)
+        try:
+            os.close(os.open(model_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            model_filename = f"sales_model_{timestamp}_{suffix}{ARTIFACT_EXTENSION}"
+            suffix += 1
+
+    with span("model.artifact_dump"):
+        artifact = dump_artifact(model, model_path, compression)
+
+    entry = {
+        "model_id": model_filename,
+        "filename": model_filename,
+        "timestamp": timestamp,
+        "features": list(features),
+        "rmse": None if rmse is None else float(rmse),
+        "algorithm": algorithm,
+        "hyperparameters": dict(hyperparameters or {}),
+        "sha256": artifact["sha256"],
+        "size_bytes": artifact["size_bytes"],
+        "compression": artifact["compression"],
+    }
+    if extra:
+        entry.update(extra)
+    if companions:
+        entry["companions"] = dict(entry.get("companions") or {})
+        entry["companion_sha256"] = dict(entry.get("companion_sha256") or {})
+        stem = os.path.splitext(model_filename)[0]
+        for name, companion in companions.items():
+            filename = f"{stem}.{name}{ARTIFACT_EXTENSION}"
+            info = dump_artifact(companion, os.path.join(model_dir, filename), compression)
+            entry["companions"][name] = filename
+            entry["companion_sha256"][name] = info["sha256"]
+
+    # Re-read under the lock so a model registered meanwhile (by another
+    # thread or process) isn't dropped. The legacy scan only lists .joblib
+    # files, so it can't pick up the artifacts saved above.
+    with _manifest_lock(model_dir):
+        entries = list(_read_manifest(model_dir, fresh=True))
+        entries.append(entry)
+        _write_manifest(entries, model_dir)
+        # Only the "latest" pointer changed; previously loaded estimators are
+        # still valid under their own ids, but drop them to release memory.
+        _model_cache.clear()
+    clear_forecast_cache()
+
+    print(f"Model saved to {model_path}")
+    if retention:
+        prune_models(retention, model_dir)
+    return entry
+
+
+def _artifact_files(entry):
+    return [entry["filename"]] + list((entry.get("companions") or {}).values())
+
+
+def prune_models(keep=MODEL_RETENTION, model_dir=MODEL_DIR):
+    """
+    Removes all but the newest `keep` registered models from the manifest and
+    deletes their files (companions shared with a kept model, as after an
+    incremental update, stay). Unregistered model files older than
+    ORPHAN_GRACE_SECONDS, e.g. left by an interrupted save, are deleted too.
+    Returns the ids of the removed models.
+    """
+    keep = max(int(keep), 1)
+    with _manifest_lock(model_dir):
+        entries = list(_read_manifest(model_dir, fresh=True))
+        if not os.path.exists(_manifest_path(model_dir)):
+            # Nothing is registered yet; legacy files are only ever listed
+            return []
+        removed, kept = entries[:-keep], entries[-keep:]
+        if removed:
+            _write_manifest(kept, model_dir)
+            removed_ids = {entry["model_id"] for entry in removed}
+            for key in [key for key in _model_cache if key[1] in removed_ids]:
+                del _model_cache[key]
+
+    referenced = {filename for entry in kept for filename in _artifact_files(entry)}
+    referenced.add(MANIFEST_NAME)
+    candidates = {filename for entry in removed for filename in _artifact_files(entry)}
+    now = time.time()
+    for filename in os.listdir(model_dir):
+        path = os.path.join(model_dir, filename)
+        if filename in referenced or not filename.startswith('sales_model_'):
+            continue
+        if filename in candidates or now - os.path.getmtime(path) > ORPHAN_GRACE_SECONDS:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Warning: Could not remove old model file {path}: {e}")
+    if removed:
+        print(f"Pruned {len(removed)} old model(s), keeping the newest {keep}.")
+    return [entry["model_id"] for entry in removed]
+
+
+def load_model(model_id=None, mmap_mode=None, model_dir=MODEL_DIR):
+    """
+    Returns (model, entry) for `model_id`, or the latest model if None.
+    Returns (None, None) when no model is registered.
+
+    Loaded estimators are cached in memory, so repeated calls are free until a
+    new model is registered. The file is checked against the registered
+    SHA-256 first; a mismatch raises ValueError. mmap_mode='r' memory-maps
+    the numpy arrays of legacy joblib files so several processes can share
+    them.
+    """
+    entry = get_model_entry(model_id, model_dir)
+    if entry is None:
+        return None, None
+
+    key = (os.path.abspath(model_dir), entry["model_id"], mmap_mode)
+    return _cached_load(key, get_model_path(entry, model_dir), mmap_mode, entry.get("sha256")), entry
+
+
+def load_companion(entry, name, mmap_mode=None, model_dir=MODEL_DIR):
+    """
+    Returns the companion artifact `name` registered with `entry`, or None if
+    the model has none. Cached like the estimators themselves.
+    """
+    filename = (entry.get("companions") or {}).get(name)
+    if filename is None:
+        return None
+    key = (os.path.abspath(model_dir), entry["model_id"], mmap_mode, name)
+    sha256 = (entry.get("companion_sha256") or {}).get(name)
+    return _cached_load(key, os.path.join(model_dir, filename), mmap_mode, sha256)
+
+
+def _cached_load(key, path, mmap_mode, sha256=None):
+    with _lock:
+        artifact = _model_cache.get(key)
+        if artifact is not None:
+            _model_cache.move_to_end(key)
+            count("model.cache_hit")
+            return artifact
+
+    # Verified against the registry's checksum before it's unpickled
+    with span("model.artifact_load", file=os.path.basename(path)):
+        artifact = load_artifact(path, sha256, mmap_mode)
+
+    with _lock:
+        _model_cache[key] = artifact
+        while len(_model_cache) > MODEL_CACHE_SIZE:
+            _model_cache.popitem(last=False)
+    return artifact
+
+
+def clear_model_cache():
+    """Drops all loaded estimators and the parsed manifest."""
+    global _manifest, _manifest_stamp
+    with _lock:
+        _model_cache.clear()
+        _manifest, _manifest_stamp = None, None
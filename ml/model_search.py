@@ -0,0 +1,137 @@
+import math
+import time
+import random
+import itertools
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import TimeSeriesSplit
+
+from ml.estimators import make_estimator
+
+SEARCH_MODES = ['grid', 'random', 'halving']
+
+DEFAULT_SEARCH_SPACE = {
+    'Gradient Boosting': {
+        'n_estimators': [100, 300, 600],
+        'learning_rate': [0.03, 0.1, 0.3],
+        'max_depth': [2, 3, 5],
+    },
+    'Hist Gradient Boosting': {
+        'n_estimators': [100, 300, 600],
+        'learning_rate': [0.03, 0.1, 0.3],
+        'max_depth': [None, 3, 6],
+    },
+    'Random Forest': {
+        'n_estimators': [100, 300, 600],
+        'max_depth': [None, 5, 10],
+    },
+    'Neural Network': {
+        'hidden_layer_sizes': [(32,), (64, 32)],
+        'learning_rate_init': [0.001, 0.01],
+        'max_iter': [500, 1000],
+    },
+}
+
+
+def generate_candidates(mode, algorithms, search_space=None, n_iter=10, random_state=42):
+    """
+    Expands the search space of each algorithm into a list of
+    (algorithm, params) candidates. 'random' samples n_iter of the full grid.
+    """
+    search_space = search_space or DEFAULT_SEARCH_SPACE
+    candidates = []
+    for algorithm in algorithms:
+        space = search_space.get(algorithm, {})
+        names = list(space)
+        for values in itertools.product(*(space[name] for name in names)):
+            candidates.append((algorithm, dict(zip(names, values))))
+
+    if mode == 'random' and len(candidates) > n_iter:
+        candidates = random.Random(random_state).sample(candidates, n_iter)
+    return candidates
+
+
+def evaluate_candidate(algorithm, params, X, y, n_splits=3):
+    """
+    Scores one candidate with time-series cross-validation (each fold trains on
+    the past and validates on the block that follows). Returns a result dict.
+    """
+    start = time.perf_counter()
+    n_splits = max(2, min(n_splits, len(X) - 1))
+    scores = []
+    for train_index, test_index in TimeSeriesSplit(n_splits=n_splits).split(X):
+        model = make_estimator(algorithm, params)
+        model.fit(X[train_index], y[train_index])
+        predictions = model.predict(X[test_index])
+        scores.append(np.sqrt(mean_squared_error(y[test_index], predictions)))
+
+    return {
+        "algorithm": algorithm,
+        "params": params,
+        "rmse": float(np.mean(scores)),
+        "n_rows": len(X),
+        "fit_time": time.perf_counter() - start,
+    }
+
+
+def _halving_schedule(n_candidates, factor):
+    """Number of candidates evaluated in each successive-halving round."""
+    sizes = [n_candidates]
+    while sizes[-1] > 1:
+        sizes.append(math.ceil(sizes[-1] / factor))
+    return sizes[:-1] or sizes
+
+
+def run_search(X, y, algorithms, mode='grid', search_space=None, n_iter=10, n_splits=3,
+               n_jobs=-1, halving_factor=3, on_result=None):
+    """
+    Evaluates hyperparameter candidates across a process pool and returns a
+    leaderboard sorted by cross-validated RMSE (best first).
+
+    `on_result(result, done, total)` is called as each candidate finishes, in
+    completion order, so callers can stream progress. In 'halving' mode every
+    round evaluates the surviving candidates on a larger, most-recent slice of
+    the data and keeps the best 1/halving_factor of them.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    candidates = generate_candidates(mode, algorithms, search_space, n_iter)
+    if not candidates:
+        raise ValueError("No hyperparameter candidates to evaluate.")
+
+    if mode == 'halving':
+        rounds = _halving_schedule(len(candidates), halving_factor)
+    else:
+        rounds = [len(candidates)]
+    total = sum(rounds)
+    done = 0
+
+    # Large arrays are memory-mapped into the workers by joblib rather than
+    # pickled once per candidate.
+    parallel = Parallel(n_jobs=n_jobs, return_as='generator_unordered')
+    min_rows = n_splits + 2
+    for round_index in range(len(rounds)):
+        fraction = halving_factor ** (round_index - len(rounds) + 1)
+        n_rows = min(len(X), max(min_rows, int(len(X) * fraction)))
+        X_round, y_round = X[-n_rows:], y[-n_rows:]
+
+        results = []
+        for result in parallel(delayed(evaluate_candidate)(algorithm, params, X_round, y_round, n_splits)
+                               for algorithm, params in candidates):
+            done += 1
+            result["round"] = round_index
+            results.append(result)
+            if on_result:
+                on_result(result, done, total)
+
+        results.sort(key=lambda r: r["rmse"])
+        if round_index + 1 < len(rounds):
+            keep = rounds[round_index + 1]
+            candidates = [(r["algorithm"], r["params"]) for r in results[:keep]]
+
+    return results
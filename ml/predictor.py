@@ -1,29 +1,77 @@
-import os
-import joblib
-import pandas as pd
 import numpy as np
-from ml.data_louder import load_and_preprocess_data
+from core.instrumentation import count, span, traced
+from ml.data_louder import dataset_fingerprint, load_and_preprocess_data
+from ml.data_quality import assess_data_quality
+from ml.feature_store import has_derived_features, history_buffers, periods_per_year, recursive_predict
+from ml.forecast_cache import cache_forecast, forecast_cache_key, get_cached_forecast
+from ml.future_features import DEFAULT_HOLIDAY_MONTHS, build_future_features
+from ml.intervals import predict_interval
+from ml.model_registry import get_model_entry, get_model_path, load_companion, load_model
+
+# Features of models registered before the feature store existed
+MODEL_FEATURES = ['Year', 'Month', 'Quarter', 'MarketingSpend', 'IsHoliday']
+HOLIDAY_MONTHS = list(DEFAULT_HOLIDAY_MONTHS)
+DEFAULT_HORIZON = 6
+DEFAULT_FREQ = 'MS'
+DEFAULT_SPEND_MULTIPLIER = 1.1
 
 def get_latest_model_path():
-    """Finds the most recently trained model file in the models directory."""
-    model_dir = 'models'
-    if not os.path.exists(model_dir):
-        return None
-    
-    files = [f for f in os.listdir(model_dir) if f.endswith('.joblib')]
-    if not files:
+    """Finds the most recently registered model file in the models directory."""
+    entry = get_model_entry()
+    if entry is None:
         return None
-        
-    latest_file = sorted(files, reverse=True)[0]
-    return os.path.join(model_dir, latest_file)
+    return get_model_path(entry)
+
+def model_performance(entry):
+    """Formats the registered evaluation metrics of a model for display."""
+    performance = {'RMSE': 'N/A'}
+    if entry.get("rmse") is not None:
+        performance['RMSE'] = f"{entry['rmse']:,.2f}"
+    if entry.get("interval_coverage") is not None:
+        performance[f"{entry['interval_level']:.0%} Interval Coverage"] = f"{entry['interval_coverage']:.0%}"
+    overall = (entry.get("backtest") or {}).get("overall")
+    if overall:
+        performance['Backtest RMSE'] = f"{overall['rmse']:,.2f}"
+        if overall.get('mape') is not None:
+            performance['Backtest MAPE'] = f"{overall['mape']:.1f}%"
+        if overall.get('wape') is not None:
+            performance['Backtest WAPE'] = f"{overall['wape']:.1f}%"
+    return performance
+
+def model_features(model, entry=None):
+    """The feature columns a model was trained on, in order."""
+    if entry is not None and entry.get("features"):
+        return list(entry["features"])
+    return list(getattr(model, 'feature_names_in_', MODEL_FEATURES))
+
+def predict_future(model, features, df_future, df_hist, entry=None, keys=None):
+    """
+    Predicts a future feature frame, returning (predictions, X). Models using
+    lag/rolling features are run recursively from the tail of `df_hist`, one
+    path per `keys` value (see ml.feature_store.recursive_predict).
+    """
+    if not has_derived_features(features):
+        X = df_future[features]
+        return model.predict(X), X
+    n_periods_per_year = (entry or {}).get("periods_per_year") or periods_per_year(df_hist['Date'])
+    buffers = history_buffers(df_hist, features, n_periods_per_year, keys)
+    return recursive_predict(model, features, df_future, buffers, n_periods_per_year)
 
-def generate_prediction_data():
+@traced("predict.generate_prediction_data")
+def generate_prediction_data(horizon=DEFAULT_HORIZON, spend_multiplier=DEFAULT_SPEND_MULTIPLIER,
+                             use_cache=True, freq=DEFAULT_FREQ, holiday_calendar=None):
     """
     Loads the latest model and generates a real forecast.
+
+    `freq` is the forecast step ('MS', 'W' or 'D') and `holiday_calendar` an
+    optional calendar from ml.future_features (default: HOLIDAY_MONTHS).
+    Results are cached per (model, dataset version, horizon, scenario), so
+    the Overview tab and reports share one computation. The returned dict is
+    shared with the cache; don't modify it in place.
     """
-    # 1. Load the latest model
-    model_path = get_latest_model_path()
-    if not model_path:
+    # 1. Load the latest model (cached in memory by the registry)
+    entry = get_model_entry()
+    if entry is None:
         # Return a dictionary with an error message and default empty data
         return {
             "error": "No trained model found. Please train a model first on the 'Prediction' tab.",
@@ -32,11 +80,21 @@ def generate_prediction_data():
             "data_quality_score": 0
         }
     
+    scenario = (spend_multiplier, freq)
+    if holiday_calendar is not None:
+        scenario += (np.asarray(holiday_calendar).tobytes(),)
+    cache_key = forecast_cache_key(entry["model_id"], dataset_fingerprint(), horizon, scenario)
+    if use_cache:
+        cached = get_cached_forecast(cache_key)
+        if cached is not None:
+            count("predict.forecast_cache_hit")
+            return cached
+
     try:
-        model = joblib.load(model_path)
+        model, entry = load_model(entry["model_id"])
     except (EOFError, ValueError) as e:
         # Handle cases where the model file is corrupt or empty
-        print(f"Error loading model file {model_path}: {e}")
+        print(f"Error loading model file {get_model_path(entry)}: {e}")
         return {
             "error": f"Corrupt model file found. Please retrain the model.",
             "historical_x": [], "historical_y": [], "predicted_x": [], "predicted_y": [],
@@ -44,40 +102,114 @@ def generate_prediction_data():
             "data_quality_score": 0
         }
     
-    # 2. Load historical data for plotting
-    df_hist = load_and_preprocess_data()
+    # 2. Load historical data for plotting, the way the model was trained on it
+    df_hist = load_and_preprocess_data(chunksize=entry.get("chunksize", 0))
     if df_hist is None:
         return {"error": "Could not load historical data."}
 
-    # 3. Create future dates to predict on
-    last_date = df_hist['Date'].max()
-    future_dates = pd.date_range(start=last_date, periods=7, freq='MS')[1:] # Next 6 months
-    
-    df_future = pd.DataFrame({'Date': future_dates})
-    df_future['Year'] = df_future['Date'].dt.year
-    df_future['Month'] = df_future['Date'].dt.month
-    df_future['Quarter'] = df_future['Date'].dt.quarter
-    # Simple assumption for future features - you could make this more complex
-    df_future['MarketingSpend'] = df_hist['MarketingSpend'].mean() * 1.1 
-    df_future['IsHoliday'] = [1 if m in [1, 5, 7, 12] else 0 for m in df_future['Month']]
+    # 3. Build the features for the next `horizon` periods in one vectorized pass
+    # Simple assumption for future spend - you could make this more complex
+    with span("predict.features", horizon=horizon):
+        df_future = build_future_features(
+            [df_hist['Date'].max()], horizon, freq,
+            marketing_spend=df_hist['MarketingSpend'].mean() * spend_multiplier,
+            holiday_calendar=holiday_calendar,
+        )
     
-    # 4. Make predictions
-    features_to_predict = ['Year', 'Month', 'Quarter', 'MarketingSpend', 'IsHoliday']
-    future_predictions = model.predict(df_future[features_to_predict])
+    # 4. Make predictions, with a band if intervals were trained alongside the model
+    features = model_features(model, entry)
+    with span("predict.model_predict", rows=len(df_future)):
+        future_predictions, X_future = predict_future(model, features, df_future, df_hist, entry)
+    try:
+        bands = load_companion(entry, "intervals")
+    except (OSError, EOFError, ValueError) as e:
+        print(f"Could not load prediction intervals for {entry['model_id']}: {e}")
+        bands = None
+    if bands is not None:
+        with span("predict.intervals", method=bands["method"]):
+            predicted_lower, predicted_upper = predict_interval(bands, X_future, future_predictions)
+    else:
+        predicted_lower, predicted_upper = [], []
+
+    # 5. Score the history (computed once per dataset version)
+    quality = assess_data_quality(df=df_hist, holiday_calendar=holiday_calendar)
 
-    # 5. Prepare data for the chart and UI
+    # 6. Prepare data for the chart and UI
     # For charting, we use a simple numerical index for the x-axis
     historical_x = np.arange(len(df_hist))
     predicted_x = np.arange(len(df_hist), len(df_hist) + len(df_future))
     
-    return {
+    result = {
         "historical_x": historical_x,
         "historical_y": df_hist['Sales'],
         "predicted_x": predicted_x,
         "predicted_y": future_predictions,
+        "predicted_lower": predicted_lower,
+        "predicted_upper": predicted_upper,
+        "interval_level": bands["level"] if bands is not None else None,
         "next_quarter_prediction": f"{future_predictions[0]/1000:.1f}K",
-        "model_performance": {'RMSE': 'N/A', 'F1 Score': 'N/A'}, # You can add metrics here
+        "model_performance": model_performance(entry),
+        "backtest": entry.get("backtest"),
         "feature_weights": {'MarketingSpend': '...'},
-        "data_quality_score": 98,
+        "data_quality_score": quality["score"],
+        "data_quality": quality,
         "error": None
-    }
\ No newline at end of file
+    }
+    if use_cache:
+        cache_forecast(cache_key, result)
+    return result
+
+
+def build_series_future_frame(df_hist, series_column, horizon=DEFAULT_HORIZON,
+                              spend_multiplier=DEFAULT_SPEND_MULTIPLIER, freq=DEFAULT_FREQ,
+                              holiday_calendar=None):
+    """
+    Builds the future feature matrix for every series in a long-format history
+    in one vectorized pass: one row per (series, future period), ordered by
+    series then date.
+    """
+    stats = df_hist.groupby(series_column, sort=True).agg(
+        last_date=('Date', 'max'), mean_spend=('MarketingSpend', 'mean')
+    )
+    return build_future_features(
+        stats['last_date'].to_numpy(), horizon, freq,
+        marketing_spend=(stats['mean_spend'].to_numpy() * spend_multiplier)[:, None],
+        holiday_calendar=holiday_calendar,
+        series_ids=stats.index.to_numpy(), series_column=series_column,
+    )
+
+
+def generate_batch_predictions(df_hist=None, series_column='Series', horizon=DEFAULT_HORIZON, model=None,
+                               spend_multiplier=DEFAULT_SPEND_MULTIPLIER, freq=DEFAULT_FREQ,
+                               holiday_calendar=None):
+    """
+    Forecasts many series (e.g. store x SKU) at once with a single
+    model.predict call on the stacked future feature matrix.
+
+    Returns a long-format DataFrame with columns [series_column, 'Date',
+    'Prediction'], or None if no model or data is available. Histories without
+    a series column are treated as a single 'Global' series.
+    """
+    entry = None
+    if model is None:
+        model, entry = load_model()
+        if model is None:
+            print("Error: No trained model found for batch forecasting.")
+            return None
+
+    if df_hist is None:
+        df_hist = load_and_preprocess_data(chunksize=(entry or {}).get("chunksize", 0))
+        if df_hist is None:
+            return None
+
+    if series_column not in df_hist.columns:
+        df_hist = df_hist.assign(**{series_column: 'Global'})
+
+    df_future = build_series_future_frame(df_hist, series_column, horizon, spend_multiplier,
+                                          freq, holiday_calendar)
+    predictions, _ = predict_future(model, model_features(model, entry), df_future, df_hist, entry,
+                                    keys=df_hist[series_column])
+
+    result = df_future[[series_column, 'Date']].copy()
+    result['Prediction'] = predictions
+    return result
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from ml.data_louder import load_and_preprocess_data
+from ml.feature_store import has_derived_features, history_buffers, periods_per_year, recursive_predict
+from ml.future_features import build_future_features
+from ml.model_registry import load_model
+from ml.predictor import DEFAULT_FREQ, DEFAULT_HORIZON, MODEL_FEATURES, model_features
+
+# Spend multipliers the Overview tab draws as a fan around the base forecast
+DEFAULT_FAN_MULTIPLIERS = np.linspace(0.7, 1.5, 41)
+
+
+def _holiday_override_flags(override, base_flags):
+    """
+    Resolves one holiday override to per-period flags: None keeps the
+    calendar's flags, 0/1 forces every period, and an array of length horizon
+    is used as-is.
+    """
+    if override is None:
+        return base_flags
+    return np.broadcast_to(np.asarray(override, dtype=np.int8), base_flags.shape)
+
+
+def build_scenario_matrix(base_frame, spend_multipliers, holiday_overrides=(None,), base_spend=1.0,
+                          features=MODEL_FEATURES):
+    """
+    Stacks the features of every (spend multiplier, holiday override)
+    combination into one DataFrame of n_scenarios * horizon rows, ordered by
+    scenario then period. Calendar columns are tiled from `base_frame`; only
+    MarketingSpend and IsHoliday differ between scenarios. Lag/rolling
+    features are left NaN for recursive_predict to fill in.
+    """
+    multipliers = np.asarray(spend_multipliers, dtype=float).ravel()
+    horizon = len(base_frame)
+    base_flags = base_frame['IsHoliday'].to_numpy()
+    holiday_matrix = np.stack([_holiday_override_flags(o, base_flags) for o in holiday_overrides])
+
+    # Multipliers vary slowest: scenario i is (multipliers[i // n_overrides], overrides[i % n_overrides])
+    n_overrides = len(holiday_matrix)
+    n_scenarios = len(multipliers) * n_overrides
+    spend = np.repeat(multipliers * base_spend, n_overrides)[:, None]
+
+    matrix = {}
+    for column in features:
+        if column == 'MarketingSpend':
+            matrix[column] = np.broadcast_to(spend, (n_scenarios, horizon)).ravel()
+        elif column == 'IsHoliday':
+            matrix[column] = np.tile(holiday_matrix, (len(multipliers), 1)).ravel()
+        elif column in base_frame.columns:
+            matrix[column] = np.tile(base_frame[column].to_numpy(), n_scenarios)
+        else:
+            matrix[column] = np.full(n_scenarios * horizon, np.nan)
+    return pd.DataFrame(matrix, columns=list(features))
+
+
+def evaluate_scenarios(spend_multipliers, holiday_overrides=(None,), horizon=DEFAULT_HORIZON,
+                       freq=DEFAULT_FREQ, model=None, df_hist=None, holiday_calendar=None):
+    """
+    Forecasts every combination of spend multiplier and holiday override with
+    a single model.predict call (one per period for models with lag features,
+    which are forecast recursively).
+
+    Spend multipliers scale the historical mean MarketingSpend, as in
+    generate_prediction_data. Returns a dict with 'predictions' (an
+    n_scenarios x horizon array), 'dates', and the 'spend_multiplier' /
+    'holiday_override' of each scenario row, or a dict with an 'error' key.
+    """
+    # 1. Load model and history
+    entry = None
+    if model is None:
+        model, entry = load_model()
+        if model is None:
+            return {"error": "No trained model found. Please train a model first on the 'Prediction' tab."}
+    if df_hist is None:
+        df_hist = load_and_preprocess_data(chunksize=(entry or {}).get("chunksize", 0))
+        if df_hist is None:
+            return {"error": "Could not load historical data."}
+
+    # 2. Calendar features are shared by every scenario
+    base_frame = build_future_features([df_hist['Date'].max()], horizon, freq,
+                                       holiday_calendar=holiday_calendar)
+    holiday_overrides = list(holiday_overrides)
+    multipliers = np.asarray(spend_multipliers, dtype=float).ravel()
+    features = model_features(model, entry)
+    X = build_scenario_matrix(base_frame, multipliers, holiday_overrides,
+                              base_spend=df_hist['MarketingSpend'].mean(), features=features)
+
+    # 3. One predict call for all scenarios (per period when recursive)
+    if has_derived_features(features):
+        n_periods_per_year = (entry or {}).get("periods_per_year") or periods_per_year(df_hist['Date'])
+        n_scenarios = len(X) // horizon
+        buffers = {column: np.repeat(buffer, n_scenarios, axis=0) for column, buffer
+                   in history_buffers(df_hist, features, n_periods_per_year).items()}
+        predictions, _ = recursive_predict(model, features, X, buffers, n_periods_per_year)
+    else:
+        predictions = model.predict(X)
+    predictions = predictions.reshape(-1, horizon)
+
+    return {
+        "dates": base_frame['Date'].to_numpy(),
+        "spend_multiplier": np.repeat(multipliers, len(holiday_overrides)),
+        "holiday_override": holiday_overrides * len(multipliers),
+        "predictions": predictions,
+        "error": None,
+    }
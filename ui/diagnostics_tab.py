@@ -0,0 +1,86 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, QLabel,
+                             QPushButton, QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt5.QtCore import QTimer
+
+from core.instrumentation import TRACE_ENV_VAR, is_enabled, reset, snapshot
+
+# How often the tables are refreshed while the tab is visible (ms)
+REFRESH_INTERVAL_MS = 2000
+
+
+class DiagnosticsTab(QWidget):
+    """Shows per-span timings and counters collected by core.instrumentation."""
+
+    def __init__(self):
+        super().__init__()
+        self.init_ui()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(REFRESH_INTERVAL_MS)
+        self.refresh()
+
+    def init_ui(self):
+        main_layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.status_label = QLabel()
+        controls.addWidget(self.status_label)
+        controls.addStretch()
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset_stats)
+        controls.addWidget(refresh_button)
+        controls.addWidget(reset_button)
+        main_layout.addLayout(controls)
+
+        span_group = QGroupBox("Timing Spans")
+        span_layout = QVBoxLayout()
+        self.span_table = self.make_table(["Span", "Calls", "Total (ms)", "Mean (ms)", "Max (ms)"])
+        span_layout.addWidget(self.span_table)
+        span_group.setLayout(span_layout)
+        main_layout.addWidget(span_group, 3)
+
+        counter_group = QGroupBox("Counters")
+        counter_layout = QVBoxLayout()
+        self.counter_table = self.make_table(["Counter", "Value"])
+        counter_layout.addWidget(self.counter_table)
+        counter_group.setLayout(counter_layout)
+        main_layout.addWidget(counter_group, 1)
+
+    def make_table(self, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        return table
+
+    def refresh(self):
+        """Reloads both tables from the current instrumentation snapshot."""
+        if not self.isVisible() and self.span_table.rowCount():
+            return
+        if not is_enabled():
+            self.status_label.setText(f"Instrumentation is off. Set {TRACE_ENV_VAR}=1 (or a log file path) to enable it.")
+        else:
+            self.status_label.setText("Collecting timings from this process and training runs.")
+
+        stats = snapshot()
+        # Slowest stages first
+        spans = sorted(stats["spans"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        self.span_table.setRowCount(len(spans))
+        for row, (name, values) in enumerate(spans):
+            cells = [name, str(values["count"]), f"{values['total_ms']:,.1f}",
+                     f"{values['mean_ms']:,.1f}", f"{values['max_ms']:,.1f}"]
+            for column, text in enumerate(cells):
+                self.span_table.setItem(row, column, QTableWidgetItem(text))
+
+        counters = sorted(stats["counters"].items())
+        self.counter_table.setRowCount(len(counters))
+        for row, (name, value) in enumerate(counters):
+            self.counter_table.setItem(row, 0, QTableWidgetItem(name))
+            self.counter_table.setItem(row, 1, QTableWidgetItem(str(value)))
+
+    def reset_stats(self):
+        reset()
+        self.refresh()
@@ -1,16 +1,30 @@
+import numpy as np
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, 
                              QGroupBox, QLabel)
 from PyQt5.QtGui import QFont
+from PyQt5.QtCore import QThread, QTimer
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 
-from ml.predictor import generate_prediction_data
+from core.downsampling import minmax_downsample, visible_slice
+from core.instrumentation import span
+from core.workers import DashboardWorker
+
+# How often the forecast is re-checked while the tab is visible (ms). Forecasts
+# are cached per model and dataset version, so an unchanged one is cheap.
+REFRESH_INTERVAL_MS = 30000
 
 class OverviewTab(QWidget):
     def __init__(self):
         super().__init__()
+        self.thread = None
+        self.worker = None
         self.init_ui()
-        self.update_dashboard()
+        # Refreshed whenever the tab is shown (e.g. after training a model)
+        # and periodically while it stays visible
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_dashboard)
 
     def init_ui(self):
         # --- Main Layout ---
@@ -23,6 +37,8 @@ class OverviewTab(QWidget):
         chart_group = QGroupBox("Quarterly Sales Projections")
         self.chart_layout = QVBoxLayout()
         self.canvas = MplCanvas(self, width=8, height=4, dpi=100)
+        # Pan/zoom; the canvas re-samples the lines to each new view
+        self.chart_layout.addWidget(NavigationToolbar(self.canvas, self))
         self.chart_layout.addWidget(self.canvas)
         chart_group.setLayout(self.chart_layout)
         top_layout.addWidget(chart_group, 3) # Give chart more space (ratio 3:1)
@@ -30,7 +46,7 @@ class OverviewTab(QWidget):
         # KPIs
         kpi_group = QGroupBox("Prediction Summary")
         kpi_layout = QVBoxLayout()
-        self.kpi_prediction_label = QLabel("15.2M")
+        self.kpi_prediction_label = QLabel("...")
         self.kpi_prediction_label.setFont(QFont("Arial", 48, QFont.Bold))
         self.kpi_title_label = QLabel("NEXT QUARTER PREDICTION")
         self.kpi_details_label = QLabel("+3.5% vs. Previous Quarter\nTOP PERFORMING SEGMENT: Enterprise")
@@ -58,7 +74,7 @@ class OverviewTab(QWidget):
         # Data Quality
         quality_group = QGroupBox("Data Quality Score")
         quality_layout = QVBoxLayout()
-        self.quality_score_label = QLabel("92%")
+        self.quality_score_label = QLabel("...")
         self.quality_score_label.setFont(QFont("Arial", 36, QFont.Bold))
         self.quality_score_label.setStyleSheet("color: #4CAF50;") # Green color
         quality_layout.addWidget(self.quality_score_label)
@@ -69,16 +85,57 @@ class OverviewTab(QWidget):
         main_layout.addLayout(top_layout)
         main_layout.addLayout(bottom_layout)
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_dashboard()
+        self.timer.start(REFRESH_INTERVAL_MS)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
+
     def update_dashboard(self):
-        """Fetches new data and updates all UI elements."""
-        data = generate_prediction_data()
-        
+        """
+        Fetches new data on a background thread; render_dashboard updates the
+        UI elements once it arrives. A chart already on screen stays up while
+        loading, so the update can modify its lines in place.
+        """
+        if self.thread and self.thread.isRunning():
+            return
+
+        if not self.canvas.lines:
+            self.show_placeholder("Loading forecast...")
+
+        self.thread = QThread()
+        self.worker = DashboardWorker()
+        self.worker.moveToThread(self.thread)
+
+        self.thread.started.connect(self.worker.run)
+        self.worker.finished.connect(self.render_dashboard)
+
+        self.worker.finished.connect(self.thread.quit)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.thread.finished.connect(self.thread.deleteLater)
+        self.thread.finished.connect(self.on_thread_finished)
+
+        self.thread.start()
+
+    def on_thread_finished(self):
+        # The QThread is deleted once it finishes; drop our reference to it
+        self.thread = None
+        self.worker = None
+
+    def show_placeholder(self, message):
+        """Shows a message in place of the chart."""
+        self.canvas.reset()
+        self.canvas.show_message(message)
+        self.canvas.draw_idle()
+
+    def render_dashboard(self, data):
+        """Updates all UI elements from a generate_prediction_data() result."""
         if data.get("error"):
             # Clear the plot and display the error message
-            self.canvas.axes.clear()
-            self.canvas.axes.text(0.5, 0.5, data["error"], 
-                                  ha='center', va='center', fontsize=12, wrap=True)
-            self.canvas.draw()
+            self.show_placeholder(data["error"])
             # Clear other UI elements
             self.kpi_prediction_label.setText("N/A")
             self.quality_score_label.setText("0%")
@@ -86,16 +143,26 @@ class OverviewTab(QWidget):
             self.clear_layout(self.feature_layout)
             return
 
-        # Update Chart
-        self.canvas.axes.clear()
-        self.canvas.axes.plot(data['historical_x'], data['historical_y'], marker='o', label='Actual Sales History')
-        self.canvas.axes.plot(data['predicted_x'], data['predicted_y'], marker='o', linestyle='--', label='Predicted')
-        self.canvas.axes.set_title("Revenue Forecast")
-        self.canvas.axes.set_xlabel("Time Period Index")
-        self.canvas.axes.set_ylabel("Sales")
-        self.canvas.axes.legend()
-        self.canvas.axes.grid(True)
-        self.canvas.draw()
+        # Update Chart: existing lines get new data instead of clearing the axes
+        self.canvas.clear_message()
+        if not self.canvas.lines:
+            self.canvas.axes.set_title("Revenue Forecast")
+            self.canvas.axes.set_xlabel("Time Period Index")
+            self.canvas.axes.set_ylabel("Sales")
+            self.canvas.axes.grid(True)
+        self.canvas.set_line('history', data['historical_x'], data['historical_y'],
+                             label='Actual Sales History', color='#1f77b4')
+        self.plot_scenario_fan(data['predicted_x'], data.get('scenarios'))
+        self.canvas.set_line('forecast', data['predicted_x'], data['predicted_y'],
+                             label='Predicted', color='#ff7f0e', linestyle='--')
+        if len(data.get('predicted_lower', [])):
+            self.canvas.set_band('interval', data['predicted_x'], data['predicted_lower'], data['predicted_upper'],
+                                 color='#ff7f0e', alpha=0.35, linewidth=0,
+                                 label=f"{data['interval_level']:.0%} Prediction Interval")
+        else:
+            self.canvas.remove_band('interval')
+        with span("ui.overview_draw", points=len(data['historical_x'])):
+            self.canvas.refresh_view()
 
         # Update KPI
         self.kpi_prediction_label.setText(data['next_quarter_prediction'])
@@ -104,9 +171,11 @@ class OverviewTab(QWidget):
         self.clear_layout(self.model_perf_layout)
         self.model_perf_layout.addWidget(QLabel("<b>Metric</b>"), 0, 0)
         self.model_perf_layout.addWidget(QLabel("<b>Value</b>"), 0, 1)
-        # You would populate this from the model handler's results in a real scenario
-        self.model_perf_layout.addWidget(QLabel("RMSE"), 1, 0)
-        self.model_perf_layout.addWidget(QLabel("..."), 1, 1)
+        for row, (metric, value) in enumerate(data['model_performance'].items(), start=1):
+            self.model_perf_layout.addWidget(QLabel(metric), row, 0)
+            self.model_perf_layout.addWidget(QLabel(value), row, 1)
+        if data.get('backtest'):
+            self.add_backtest_rows(data['backtest'], len(data['model_performance']) + 1)
 
 
         # Update Feature Weights Table
@@ -117,8 +186,41 @@ class OverviewTab(QWidget):
         self.feature_layout.addWidget(QLabel("MarketingSpend"), 1, 0)
         self.feature_layout.addWidget(QLabel("..."), 1, 1)
 
-        # Update Data Quality Score
-        self.quality_score_label.setText(f"{data['data_quality_score']}%")
+        # Update Data Quality Score, with the individual checks on hover
+        score = data['data_quality_score']
+        self.quality_score_label.setText(f"{score}%")
+        color = '#4CAF50' if score >= 90 else '#FF9800' if score >= 70 else '#F44336'
+        self.quality_score_label.setStyleSheet(f"color: {color};")
+        checks = data.get('data_quality', {}).get('checks', {})
+        self.quality_score_label.setToolTip("\n".join(
+            f"{name.replace('_', ' ').capitalize()}: {check['affected']:,} of {check['total']:,} ({check['score']:.0%})"
+            for name, check in checks.items()))
+
+    def plot_scenario_fan(self, x, scenarios):
+        """Shades the range of the what-if spend scenarios around the forecast."""
+        if not scenarios or scenarios.get("error"):
+            self.canvas.remove_band('fan_range')
+            self.canvas.remove_band('fan_iqr')
+            return
+        predictions = scenarios['predictions']
+        multipliers = scenarios['spend_multiplier']
+        low, q25, q75, high = np.percentile(predictions, [0, 25, 75, 100], axis=0)
+        self.canvas.set_band('fan_range', x, low, high, color='#ff7f0e', alpha=0.12, linewidth=0,
+                             label=f'Spend x{multipliers.min():.1f}-{multipliers.max():.1f}')
+        self.canvas.set_band('fan_iqr', x, q25, q75, color='#ff7f0e', alpha=0.25, linewidth=0)
+
+    def add_backtest_rows(self, backtest, first_row):
+        """Appends the per-horizon backtest errors below the summary metrics."""
+        headers = ["<b>Horizon</b>", "<b>RMSE</b>", "<b>MAPE</b>", "<b>WAPE</b>"]
+        for column, header in enumerate(headers):
+            self.model_perf_layout.addWidget(QLabel(header), first_row, column)
+        for row, step in enumerate(backtest['per_horizon'], start=first_row + 1):
+            cells = [f"+{step['horizon']}",
+                     f"{step['rmse']:,.0f}" if step['rmse'] is not None else "-",
+                     f"{step['mape']:.1f}%" if step['mape'] is not None else "-",
+                     f"{step['wape']:.1f}%" if step['wape'] is not None else "-"]
+            for column, text in enumerate(cells):
+                self.model_perf_layout.addWidget(QLabel(text), row, column)
 
     def clear_layout(self, layout):
         """Helper function to clear all widgets from a layout."""
@@ -129,8 +231,145 @@ class OverviewTab(QWidget):
 
 
 class MplCanvas(FigureCanvas):
-    """A custom Matplotlib canvas widget to embed in PyQt."""
+    """
+    A custom Matplotlib canvas widget to embed in PyQt.
+
+    Lines added with set_line keep their full data but only draw what the
+    current view needs: the visible range, min/max-decimated to one bin per
+    pixel column, with markers only once few enough points are visible. Lines
+    and bands are animated artists updated in place and drawn over a cached
+    background, so updates that leave the axes alone are blitted instead of
+    redrawing the figure.
+    """
+    # Show point markers when at most this many points are visible
+    MAX_MARKER_POINTS = 60
+
     def __init__(self, parent=None, width=5, height=4, dpi=100):
         fig = Figure(figsize=(width, height), dpi=dpi)
         self.axes = fig.add_subplot(111)
-        super(MplCanvas, self).__init__(fig)
\ No newline at end of file
+        super(MplCanvas, self).__init__(fig)
+        self.lines = {}   # name -> (x, y, Line2D), full-resolution data
+        self.bands = {}   # name -> PolyCollection
+        self.message = None
+        self.background = None
+        # Set when a static artist changed and the background must be redrawn
+        self.needs_draw = True
+        self.mpl_connect('draw_event', self.on_draw)
+        self.axes.callbacks.connect('xlim_changed', self.on_xlim_changed)
+
+    def reset(self):
+        """Clears the axes and forgets all lines and bands."""
+        self.axes.clear()
+        # clear() replaces the axes' callback registry
+        self.axes.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        self.lines.clear()
+        self.bands.clear()
+        self.message = None
+        self.background = None
+        self.needs_draw = True
+
+    def show_message(self, text):
+        """Shows `text` centered on the axes, replacing any previous message."""
+        self.clear_message()
+        self.message = self.axes.text(0.5, 0.5, text, transform=self.axes.transAxes,
+                                      ha='center', va='center', fontsize=12, wrap=True)
+        self.needs_draw = True
+
+    def clear_message(self):
+        if self.message is not None:
+            self.message.remove()
+            self.message = None
+            self.needs_draw = True
+
+    def set_line(self, name, x, y, **style):
+        """Creates or updates the line `name`; x must be sorted ascending."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if name in self.lines:
+            line = self.lines[name][2]
+        else:
+            line, = self.axes.plot([], [], animated=True, markersize=4, **style)
+        self.lines[name] = (x, y, line)
+        self.resample_line(name)
+
+    def set_band(self, name, x, lower, upper, label=None, **style):
+        """Creates the shaded band `name`, or moves its outline to the new data."""
+        band = self.bands.get(name)
+        if band is None:
+            self.bands[name] = self.axes.fill_between(x, lower, upper, animated=True, label=label, **style)
+            return
+        x = np.asarray(x, dtype=float)
+        outline = np.concatenate([np.column_stack([x, np.asarray(upper, dtype=float)]),
+                                  np.column_stack([x, np.asarray(lower, dtype=float)])[::-1]])
+        band.set_verts([outline])
+        # A new label only changes the legend, which refresh_view checks
+        if label is not None:
+            band.set_label(label)
+
+    def remove_band(self, name):
+        band = self.bands.pop(name, None)
+        if band is not None:
+            band.remove()
+            self.needs_draw = True
+
+    def resample_line(self, name):
+        """Sets the drawn data of a line to the level of detail of the current view."""
+        x, y, line = self.lines[name]
+        start, stop = visible_slice(x, *self.axes.get_xlim())
+        visible_x, visible_y = minmax_downsample(x[start:stop], y[start:stop],
+                                                 max(1, int(self.axes.bbox.width)))
+        line.set_data(visible_x, visible_y)
+        line.set_marker('o' if stop - start <= self.MAX_MARKER_POINTS else 'None')
+
+    def on_xlim_changed(self, axes):
+        # Pan/zoom: re-sample every line for the new view before it is drawn
+        for name in self.lines:
+            self.resample_line(name)
+
+    def refresh_view(self):
+        """
+        Shows the current data. Rescales to fit it and redraws fully when the
+        limits or static artists changed; otherwise just blits the lines.
+        """
+        old_limits = (self.axes.get_xlim(), self.axes.get_ylim())
+        self.axes.ignore_existing_data_limits = True
+        for x, y, _ in self.lines.values():
+            if len(x):
+                self.axes.update_datalim([(x.min(), np.nanmin(y)), (x.max(), np.nanmax(y))])
+        for band in self.bands.values():
+            self.axes.update_datalim(band.get_datalim(self.axes.transData).get_points())
+        self.axes.autoscale_view()
+        if (self.axes.get_xlim(), self.axes.get_ylim()) == old_limits:
+            # The view didn't move, so xlim_changed didn't fire
+            for name in self.lines:
+                self.resample_line(name)
+
+        handles, labels = self.axes.get_legend_handles_labels()
+        legend = self.axes.get_legend()
+        stale = (self.background is None or self.needs_draw
+                 or (self.axes.get_xlim(), self.axes.get_ylim()) != old_limits
+                 or legend is None or [t.get_text() for t in legend.get_texts()] != labels)
+        if stale:
+            if labels:
+                self.axes.legend(handles, labels)
+            self.draw()
+            self.needs_draw = False
+        else:
+            self.blit_lines()
+
+    def on_draw(self, event):
+        """Caches the background without the bands and lines, then draws them on top."""
+        self.background = self.copy_from_bbox(self.figure.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        for band in self.bands.values():
+            self.axes.draw_artist(band)
+        for _, _, line in self.lines.values():
+            self.axes.draw_artist(line)
+
+    def blit_lines(self):
+        """Redraws only the animated bands and lines over the cached background."""
+        self.restore_region(self.background)
+        self.draw_animated()
+        self.blit(self.figure.bbox)
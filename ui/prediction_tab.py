@@ -1,14 +1,16 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, 
                              QLabel, QCheckBox, QLineEdit, QSlider, QPushButton,
-                             QProgressBar, QSpacerItem, QSizePolicy)
+                             QProgressBar, QSpacerItem, QSizePolicy, QComboBox)
 from PyQt5.QtCore import Qt, QThread
 from core.workers import ModelTrainingWorker
+from ml.backtest import DEFAULT_BACKTEST_FOLDS
 
 class PredictionTab(QWidget):
     def __init__(self):
         super().__init__()
         self.thread = None
         self.worker = None
+        self.best_candidate = None
         self.init_ui()
         
         # Connect signals to slots
@@ -45,10 +47,12 @@ class PredictionTab(QWidget):
         algo_group = QGroupBox("Algorithm Choice")
         algo_layout = QVBoxLayout()
         self.algo_gradient_boosting = QCheckBox("Gradient Boosting")
+        self.algo_hist_gradient_boosting = QCheckBox("Hist Gradient Boosting")
         self.algo_random_forest = QCheckBox("Random Forest")
         self.algo_neural_network = QCheckBox("Neural Network")
         self.algo_gradient_boosting.setChecked(True)
         algo_layout.addWidget(self.algo_gradient_boosting)
+        algo_layout.addWidget(self.algo_hist_gradient_boosting)
         algo_layout.addWidget(self.algo_random_forest)
         algo_layout.addWidget(self.algo_neural_network)
         algo_group.setLayout(algo_layout)
@@ -60,10 +64,26 @@ class PredictionTab(QWidget):
         self.n_estimators_slider.setRange(100, 1000)
         self.n_estimators_slider.setValue(100)
         hyper_layout.addWidget(self.n_estimators_slider)
-        hyper_layout.addWidget(QLabel("Max Training:"))
+        self.max_training_label = QLabel("Max Training: 100% of iterations")
+        hyper_layout.addWidget(self.max_training_label)
         self.max_training_slider = QSlider(Qt.Horizontal)
+        self.max_training_slider.setRange(1, 100)
         self.max_training_slider.setValue(100)
+        self.max_training_slider.valueChanged.connect(
+            lambda value: self.max_training_label.setText(f"Max Training: {value}% of iterations")
+        )
         hyper_layout.addWidget(self.max_training_slider)
+        hyper_layout.addWidget(QLabel("Hyperparameter Search:"))
+        self.search_mode_combo = QComboBox()
+        self.search_mode_combo.addItem("Off", None)
+        self.search_mode_combo.addItem("Grid", "grid")
+        self.search_mode_combo.addItem("Random", "random")
+        self.search_mode_combo.addItem("Successive Halving", "halving")
+        hyper_layout.addWidget(self.search_mode_combo)
+        self.incremental_checkbox = QCheckBox("Incremental update (new rows only)")
+        hyper_layout.addWidget(self.incremental_checkbox)
+        self.backtest_checkbox = QCheckBox("Backtest after training (slower)")
+        hyper_layout.addWidget(self.backtest_checkbox)
         hyper_group.setLayout(hyper_layout)
         center_vbox.addWidget(hyper_group)
         content_layout.addLayout(center_vbox, 1)
@@ -110,16 +130,32 @@ class PredictionTab(QWidget):
         self.retrain_button.setEnabled(False)
         self.cancel_button.setEnabled(True)
         self.training_progress.setValue(0)
+        self.best_candidate = None
 
         # 2. Gather data from UI
         selected_features = [name for name, cb in self.feature_checkboxes.items() if cb.isChecked()]
+        algorithm_checkboxes = [self.algo_gradient_boosting, self.algo_hist_gradient_boosting,
+                                self.algo_random_forest, self.algo_neural_network]
+        selected_algorithms = [cb.text() for cb in algorithm_checkboxes if cb.isChecked()] or ["Gradient Boosting"]
+        hyperparameters = {
+            "n_estimators": self.n_estimators_slider.value(),
+            "max_training": self.max_training_slider.value(),
+            "incremental": self.incremental_checkbox.isChecked(),
+            "backtest_folds": DEFAULT_BACKTEST_FOLDS if self.backtest_checkbox.isChecked() else 0,
+        }
+        search_mode = self.search_mode_combo.currentData()
+        if search_mode:
+            hyperparameters["search"] = search_mode
+            hyperparameters["algorithms"] = selected_algorithms
+            self.summary_label_progress.setText("Training Progress: searching...")
         
         # 3. Create a QThread and a worker object
         self.thread = QThread()
         self.worker = ModelTrainingWorker(
             selected_features=selected_features,
-            algorithm_choice="Gradient Boosting",
-            hyperparameters={"n_estimators": self.n_estimators_slider.value()}
+            # Outside search mode the first checked algorithm is trained
+            algorithm_choice=selected_algorithms[0],
+            hyperparameters=hyperparameters
         )
         
         # 4. Move worker to the thread
@@ -129,39 +165,56 @@ class PredictionTab(QWidget):
         self.thread.started.connect(self.worker.run)
         self.worker.finished.connect(self.on_training_finished)
         self.worker.progress.connect(self.set_progress)
+        self.worker.candidate_result.connect(self.on_candidate_result)
         
         # Cleanup connections
         self.worker.finished.connect(self.thread.quit)
         self.worker.finished.connect(self.worker.deleteLater)
         self.thread.finished.connect(self.thread.deleteLater)
+        self.thread.finished.connect(self.on_thread_finished)
         
         # 6. Start the thread
         self.thread.start()
 
+    def on_thread_finished(self):
+        # The QThread is deleted once it finishes; drop our reference to it
+        self.thread = None
+        self.worker = None
+
     def cancel_training(self):
         """Stops the training thread."""
         print("UI: Attempting to cancel training...")
         if self.thread and self.thread.isRunning():
+            # The worker terminates the training process and then emits
+            # finished, which re-enables the UI; no need to block on it here.
             self.worker.stop()
-            self.thread.quit()
-            self.thread.wait() # Wait for the thread to finish
-            print("UI: Training canceled.")
-            self.retrain_button.setEnabled(True)
             self.cancel_button.setEnabled(False)
-            self.training_progress.setValue(0)
-            self.training_progress.setFormat("Cancelled")
+            self.training_progress.setFormat("Cancelling...")
 
     def set_progress(self, value):
         """Updates the progress bar."""
         self.training_progress.setValue(value)
         self.training_progress.setFormat(f"Training Model... {value}%")
 
+    def on_candidate_result(self, result):
+        """Shows the best hyperparameter search candidate seen so far."""
+        best = self.best_candidate
+        if best is None or result["rmse"] < best["rmse"]:
+            self.best_candidate = best = result
+        self.summary_label_progress.setText(
+            f"Best so far: {best['algorithm']} (CV RMSE {best['rmse']:,.2f})"
+        )
+
     def on_training_finished(self, results):
         """Handles the results from the worker thread."""
         print("UI: Worker finished, received results.")
         
-        # Check if an error occurred during training
-        if "error" in results:
+        # Check if training was canceled or an error occurred
+        if results.get("canceled"):
+            print("UI: Training canceled.")
+            self.training_progress.setValue(0)
+            self.training_progress.setFormat("Cancelled")
+        elif "error" in results:
             self.summary_label_accuracy.setText(f"Status: Error")
             self.summary_label_model_id.setText(f"Details: {results['error']}")
             self.training_progress.setFormat("Error")
@@ -170,6 +223,8 @@ class PredictionTab(QWidget):
             self.summary_label_accuracy.setText(f"Model RMSE: {results['rmse']}")
             self.summary_label_model_id.setText(f"Model ID: {results['model_id']}")
             self.training_progress.setFormat("Completed")
+            if results.get("leaderboard"):
+                self.summary_label_progress.setText(f"Search winner: {results['algorithm']}")
 
         # Re-enable the UI
         self.retrain_button.setEnabled(True)
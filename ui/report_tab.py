@@ -1,17 +1,24 @@
 import os
 import datetime
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox, 
+from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox,
                              QLabel, QPushButton, QListWidget, QListWidgetItem)
-from PyQt5.QtCore import QThread, Qt, QSize
+from PyQt5.QtCore import Qt, QSize, pyqtSignal
 from PyQt5.QtGui import QIcon
 
-from core.workers import ReportGenerationWorker
+from core.report_generator import ReportQueue
 
 class ReportsTab(QWidget):
+    # Emitted from the report queue's thread; Qt delivers it on the UI thread
+    report_finished = pyqtSignal(str, bool)
+
     def __init__(self):
         super().__init__()
-        self.thread = None
-        self.worker = None
+        self.report_queue = ReportQueue()
+        self.queued_names = set()
+        self.report_finished.connect(self.on_report_finished)
+        # Child widgets get no closeEvent when the main window closes, so
+        # stop the report processes when the application quits
+        QApplication.instance().aboutToQuit.connect(self.shutdown_queue)
         self.init_ui()
 
     def init_ui(self):
@@ -41,39 +48,42 @@ class ReportsTab(QWidget):
         main_layout.addWidget(list_group)
         self.setLayout(main_layout)
 
-    def start_report_generation(self):
-        # Disable button to prevent multiple clicks
-        self.generate_button.setEnabled(False)
-        self.generate_button.setText("Generating...")
+    def closeEvent(self, event):
+        self.shutdown_queue()
+        super().closeEvent(event)
 
+    def shutdown_queue(self):
+        """Cancels queued reports and lets the worker processes exit without waiting for them."""
+        self.report_queue.shutdown(wait=False)
+
+    def start_report_generation(self):
         # Create a unique report name and path
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         report_name = f"Quarterly_Sales_Forecast_{timestamp}"
+        # Reports can now be queued faster than one per second
+        suffix = 1
+        base_name = report_name
+        while report_name in self.queued_names:
+            report_name = f"{base_name}_{suffix}"
+            suffix += 1
+        self.queued_names.add(report_name)
         output_path = os.path.join("reports", f"{report_name}.pdf")
 
         # Add a placeholder item to the list
-        self.add_report_item(report_name, "In Progress")
+        self.add_report_item(report_name, "Queued")
 
-        # --- Threading ---
-        self.thread = QThread()
-        self.worker = ReportGenerationWorker(output_path, report_name)
-        self.worker.moveToThread(self.thread)
-
-        self.thread.started.connect(self.worker.run)
-        self.worker.finished.connect(self.on_report_finished)
-        
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-
-        self.thread.start()
+        # --- Queue the job; the button stays enabled so more can be queued ---
+        self.report_queue.submit(
+            output_path, report_name,
+            on_done=lambda path, success, error: self.report_finished.emit(path, success)
+        )
 
     def on_report_finished(self, report_path, success):
         # Find the item in the list and update its status
         for i in range(self.report_list.count()):
             item = self.report_list.item(i)
             widget = self.report_list.itemWidget(item)
-            if widget.property("report_name") in report_path:
+            if widget.property("report_name") == os.path.splitext(os.path.basename(report_path))[0]:
                 status_label = widget.findChild(QLabel, "status_label")
                 if success:
                     status_label.setText("Completed")
@@ -82,9 +92,6 @@ class ReportsTab(QWidget):
                     status_label.setText("Failed")
                     status_label.setStyleSheet("color: red;")
                 break
-        
-        self.generate_button.setEnabled(True)
-        self.generate_button.setText("Generate New Report")
 
     def add_report_item(self, name, status):
         item = QListWidgetItem(self.report_list)